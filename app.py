@@ -1,14 +1,6 @@
 import os
 import streamlit as st
-from tts_tool import tts_tool
-from mp3_to_mp4_tool import mp3_to_mp4_tool
-from mp4_subtitle_animation_tool import mp4_subtitle_animation_tool
-from mp3_word_timestamp_tool import mp3_word_timestamp_tool  # New Import
-from template_designer_tool import template_designer_tool  # ✅ Function Import
-
-
-
-
+from tool_registry import TOOLS, IMPORT_COSTS, load_tool  # Tools are imported only when first opened
 
 # ✅ Keep only ONE set_page_config call
 st.set_page_config(
@@ -69,47 +61,23 @@ st.title("🎥 AudioVisual Studio")
 st.markdown("---")
 
 # Cards for the tools
-col1, col2, col3, col4, col5 = st.columns(5)  # Added extra column for Template Designer
-
-with col1:
-    if st.button("📝 Text-to-Speech"):
-        st.session_state.selected_tool = "Text-to-Speech"
-    st.markdown("""<div class="card"><h3>📝 Text-to-Speech</h3><p>Convert text to speech.</p></div>""", unsafe_allow_html=True)
-
-with col2:
-    if st.button("🎧 MP3 to MP4"):
-        st.session_state.selected_tool = "MP3 to MP4"
-    st.markdown("""<div class="card"><h3>🎧 MP3 to MP4</h3><p>Convert MP3 files to MP4 videos.</p></div>""", unsafe_allow_html=True)
-
-with col3:
-    if st.button("🎤 MP3 Word Timestamps"):
-        st.session_state.selected_tool = "MP3 Word Timestamps"
-    st.markdown("""<div class="card"><h3>🎤 MP3 Word Timestamps</h3><p>Generate word-level speech timestamps.</p></div>""", unsafe_allow_html=True)
-
-with col4:   
-    if st.button("🎮 MP4 Subtitle Animation"):
-        st.session_state.selected_tool = "MP4 Subtitle Animation"
-    st.markdown("""<div class="card"><h3>🎮 MP4 Subtitle Animation</h3><p>Create animated subtitles for videos.</p></div>""", unsafe_allow_html=True)    
-
-with col5:
-    if st.button("🎨 Template Designer"):
-        st.session_state.selected_tool = "Template Designer"
-    st.markdown("""<div class="card"><h3>🎨 Template Designer</h3><p>Create and apply subtitle styles.</p></div>""", unsafe_allow_html=True)
+for column, (name, tool) in zip(st.columns(len(TOOLS)), TOOLS.items()):
+    with column:
+        if st.button(f"{tool['icon']} {name}"):
+            st.session_state.selected_tool = name
+        st.markdown(f"""<div class="card"><h3>{tool['icon']} {name}</h3><p>{tool['description']}</p></div>""", unsafe_allow_html=True)
 
 # Tool Sections
 st.markdown("---")
 
-if st.session_state.selected_tool == "Text-to-Speech":
-    tts_tool()
-elif st.session_state.selected_tool == "MP3 to MP4":
-    mp3_to_mp4_tool()
-elif st.session_state.selected_tool == "MP4 Subtitle Animation":
-    mp4_subtitle_animation_tool()
-elif st.session_state.selected_tool == "MP3 Word Timestamps":
-    mp3_word_timestamp_tool()    
-    # Correct function call inside condition
-elif st.session_state.selected_tool == "Template Designer":
-    template_designer_tool()  # ✅ Correct Function Call
+load_tool(st.session_state.selected_tool)()
+
+# Startup cost of each tool loaded so far by this server process
+with st.sidebar.expander("⏱ Tool Import Times"):
+    # Plain markdown: a dataframe would pull in pandas and pyarrow just for this
+    st.markdown("\n".join(
+        f"- **{name}**: {cost['seconds']:.3f}s, {cost['modules']} modules" for name, cost in IMPORT_COSTS.items()
+    ))
 
 st.markdown("---")
 st.markdown("© 2025 AudioVisual Studio. All rights reserved.")
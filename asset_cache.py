@@ -0,0 +1,176 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import urllib.request
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from disk_cache import DiskCache
+
+# Relative asset paths (e.g. a template's "assets/...") that are not found from the
+# working directory are looked up next to the app, so headless runs work from anywhere
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Local Twemoji PNGs (72x72 assets, named by code point, e.g. 1f600.png)
+TWEMOJI_DIR = os.environ.get("AVS_TWEMOJI_DIR", os.path.join("assets", "twemoji"))
+MAX_ASSET_CACHE_BYTES = int(os.environ.get("AVS_ASSET_CACHE_MB", "256")) * (1 << 20)
+MEMORY_CACHE_SIZE = 64  # Decoded overlay variants kept per process; a job uses a handful
+
+logger = logging.getLogger(__name__)
+
+
+def sprite_bytes(value):
+    """Memory held by the arrays in a cached entry, including those nested in dicts, lists and tuples."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(sprite_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(sprite_bytes(item) for item in value)
+    return 0
+
+
+class SpriteCache:
+    """Bounded LRU of rendered overlays; render() makes an entry that is missing.
+
+    With max_bytes, entries are also evicted while their arrays together
+    exceed it, though the newest entry is always kept.
+    """
+
+    def __init__(self, max_entries, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        sprite = render()
+        self.entries[key] = sprite
+        if self.max_bytes is not None:
+            self.sizes[key] = sprite_bytes(sprite)
+            self.bytes += self.sizes[key]
+        while len(self.entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes and len(self.entries) > 1
+        ):
+            evicted, _ = self.entries.popitem(last=False)
+            self.bytes -= self.sizes.pop(evicted, 0)
+        return sprite
+
+
+_memory_cache = SpriteCache(MEMORY_CACHE_SIZE)  # (content hash, scale, opacity) -> premultiplied BGRA image
+_memory_lock = threading.Lock()  # Streamlit sessions share the module
+_disk_cache = None
+
+
+def get_asset_cache():
+    """Downloads and prepared overlay variants, on disk and bounded like the other caches."""
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = DiskCache("assets", MAX_ASSET_CACHE_BYTES)
+    return _disk_cache
+
+
+def read_asset_bytes(source):
+    """Reads an image from a local path or URL; downloads are kept on disk by URL."""
+    if source.startswith(("http://", "https://")):
+        cache = get_asset_cache()
+        key = f"url-{hashlib.sha256(source.encode()).hexdigest()}"
+        data = cache.get_bytes(key)
+        if data is None:
+            try:
+                with urllib.request.urlopen(source, timeout=10) as response:
+                    data = response.read()
+            except OSError as e:
+                logger.warning("Could not download image from %s: %s", source, e)
+                return None
+            cache.put_bytes(key, data)
+        return data
+
+    if not os.path.exists(source) and not os.path.isabs(source):
+        source = os.path.join(APP_DIR, source)
+    if not os.path.exists(source):
+        return None
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def prepare_overlay(data, scale, opacity):
+    """Decodes image bytes to a scaled BGRA image with opacity folded into premultiplied alpha."""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    elif image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    alpha = image[:, :, 3:4].astype(np.float32) / 255.0 * opacity
+    premultiplied = np.concatenate([image[:, :, :3] * alpha, alpha * 255.0], axis=2)
+    return np.round(premultiplied).astype(np.uint8)
+
+
+def load_overlay_asset(source, scale=1.0, opacity=1.0):
+    """Returns a decoded, pre-scaled, premultiplied BGRA overlay, or None if unavailable.
+
+    Results are cached in memory and on disk by content hash, scale and
+    opacity, so each variant is only decoded and resized once.
+    """
+    data = read_asset_bytes(source)
+    if data is None:
+        return None
+
+    key = (hashlib.sha256(data).hexdigest(), float(scale), float(opacity))
+    with _memory_lock:
+        return _memory_cache.get(key, lambda: load_variant(data, *key))
+
+
+def load_variant(data, content_hash, scale, opacity):
+    """One overlay variant from the disk cache, or prepared from the image bytes and stored there."""
+    cache = get_asset_cache()
+    cache_key = f"{content_hash}_{scale:g}_{opacity:g}.npy"
+    stored = cache.get_bytes(cache_key)
+    if stored is not None:
+        return np.load(io.BytesIO(stored))
+
+    image = prepare_overlay(data, scale, opacity)
+    if image is not None:
+        buffer = io.BytesIO()
+        np.save(buffer, image)
+        cache.put_bytes(cache_key, buffer.getvalue())  # Per-thread temp name, then an atomic rename
+    return image
+
+
+def twemoji_path(emoji_char, twemoji_dir=TWEMOJI_DIR):
+    """Finds the local Twemoji PNG for an emoji, with or without variation selectors."""
+    codes = [f"{ord(c):x}" for c in emoji_char]
+    if not os.path.isdir(twemoji_dir) and not os.path.isabs(twemoji_dir):
+        twemoji_dir = os.path.join(APP_DIR, twemoji_dir)
+    for name in ("-".join(codes), "-".join(code for code in codes if code != "fe0f")):
+        path = os.path.join(twemoji_dir, f"{name}.png")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_twemoji(emoji_char, size, opacity=1.0, twemoji_dir=TWEMOJI_DIR):
+    """Loads a Twemoji from the local directory as a premultiplied BGRA image of about size pixels."""
+    path = twemoji_path(emoji_char, twemoji_dir)
+    if path is None:
+        return None
+    return load_overlay_asset(path, scale=size / 72.0, opacity=opacity)
@@ -0,0 +1,186 @@
+"""Headless batch renderer: burns subtitles into many videos from a manifest.
+
+    python batch_render.py manifest.json --jobs 4
+    python batch_render.py manifest.jsonl --force --report batch_report.json
+
+The manifest is a JSON list (or a single job object), or a .jsonl file of jobs:
+
+    {"video": "in/clip.mp4", "transcript": "in/clip.json", "template": "template1", "output": "out/clip.mp4"}
+
+A job may also set "report" (where to write its render report), "workers"
+and "chunk_seconds". Relative paths are resolved against the manifest's
+directory. template is a name in Templates/, a path to a .json file, or
+left out for the default style. A job whose output is newer than its video,
+transcript and template is skipped, so an interrupted batch picks up where
+it stopped.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from engine import render_subtitles, template_path
+
+REQUIRED_KEYS = ("video", "transcript", "output")
+
+
+def load_manifest(path):
+    """Reads the manifest's jobs, with paths resolved against its directory."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        try:
+            entries = json.loads(text)
+        except json.JSONDecodeError:
+            entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(entries, dict):
+        entries = entries["jobs"] if "jobs" in entries else [entries]  # A single job on its own
+    if not isinstance(entries, list):
+        raise ValueError(f"Manifest {path} must hold a list of jobs, not {type(entries).__name__}")
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Manifest job {number} must be an object, not {type(entry).__name__}: {entry!r}")
+        missing = [key for key in REQUIRED_KEYS if not entry.get(key)]
+        if missing:
+            raise ValueError(f"Manifest job {number} is missing {', '.join(missing)}")
+        job = dict(entry)
+        for key in REQUIRED_KEYS:
+            job[key] = os.path.join(base, entry[key])
+        if entry.get("report"):
+            job["report"] = os.path.join(base, entry["report"])
+        template = entry.get("template")
+        if template and template.endswith(".json"):
+            job["template"] = os.path.join(base, template)
+        jobs.append(job)
+    return jobs
+
+
+def is_up_to_date(job):
+    """True when the output exists and is newer than every input, as make would judge it."""
+    inputs = [job["video"], job["transcript"], template_path(job.get("template"))]
+    try:
+        output_mtime = os.path.getmtime(job["output"])
+        return all(os.path.getmtime(path) <= output_mtime for path in inputs if path)
+    except OSError:
+        return False  # A missing input is left for the render to report
+
+
+def partial_path(output_path):
+    """Where a job renders before its output is moved into place."""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.partial{ext}"
+
+
+def run_job(job, render_workers, chunk_seconds, cores=None):
+    """Process-pool worker: renders one job; returns its render report.
+
+    The video is written under a temporary name and renamed when complete,
+    so a killed batch never leaves an output that looks up to date.
+    """
+    os.makedirs(os.path.dirname(job["output"]) or ".", exist_ok=True)
+    temp_path = partial_path(job["output"])
+    try:
+        report = render_subtitles(
+            job["video"], job["transcript"], temp_path, job.get("template"),
+            workers=job.get("workers", render_workers), chunk_seconds=job.get("chunk_seconds", chunk_seconds),
+            report_path=job.get("report"), cores=cores,
+        )
+    except BaseException as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if isinstance(e, Exception):
+            # Some errors (ffmpeg.Error) cannot be unpickled by the parent and would break the pool
+            stderr = getattr(e, "stderr", None)
+            detail = stderr.decode("utf-8", "replace").strip().splitlines()[-1:] if isinstance(stderr, bytes) else []
+            raise RuntimeError(" ".join([f"{type(e).__name__}: {e}"] + detail)) from None
+        raise
+    os.replace(temp_path, job["output"])
+    report["output"] = job["output"]
+    return report
+
+
+def format_throughput(report):
+    realtime = report["frames"] / report["source_fps"] / report["wall_seconds"] if report["wall_seconds"] else 0.0
+    return (
+        f"{report['frames']} frames in {report['wall_seconds']:.1f}s "
+        f"({report['fps']:.1f} fps, {realtime:.2f}x realtime)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="JSON or JSON Lines file of video/transcript/template/output jobs")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Videos rendered at the same time")
+    parser.add_argument("--render-workers", type=int, default=1, help="Chunk processes per video (see subtitle_renderer)")
+    parser.add_argument("--chunk-seconds", type=int, default=None, help="Chunk length when --render-workers > 1")
+    parser.add_argument("--force", action="store_true", help="Render jobs whose outputs are already up to date")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be rendered")
+    parser.add_argument("--report", default=None, help="Write per-job reports and totals as JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read manifest: {e}")
+    pending = [job for job in jobs if args.force or not is_up_to_date(job)]
+    width = len(str(len(jobs)))
+    for job in jobs:
+        if job not in pending:
+            print(f"[{'-' * width}/{len(jobs)}] up to date  {job['output']}")
+    if args.dry_run:
+        for job in pending:
+            print(f"would render {job['video']} -> {job['output']}")
+        return 0
+
+    started = time.perf_counter()
+    results, failures = [], []
+    context = multiprocessing.get_context("spawn")
+    concurrent = max(1, min(args.jobs, len(pending) or 1))
+    cores = max(1, (os.cpu_count() or 1) // concurrent)  # Each video's encoders get its share of the machine
+    with ProcessPoolExecutor(max_workers=concurrent, mp_context=context) as pool:
+        futures = {pool.submit(run_job, job, args.render_workers, args.chunk_seconds, cores): job for job in pending}
+        for number, future in enumerate(as_completed(futures), start=1):
+            job = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                failures.append({"output": job["output"], "error": str(e)})
+                print(f"[{number:{width}}/{len(pending)}] FAILED      {job['output']}: {e}")
+                continue
+            results.append(report)
+            print(f"[{number:{width}}/{len(pending)}] rendered    {job['output']}: {format_throughput(report)}")
+
+    wall_seconds = time.perf_counter() - started
+    frames = sum(report["frames"] for report in results)
+    print(
+        f"Rendered {len(results)}, skipped {len(jobs) - len(pending)}, failed {len(failures)} in {wall_seconds:.1f}s"
+        + (f"; {frames} frames at {frames / wall_seconds:.1f} fps overall" if results else "")
+    )
+
+    if args.report:
+        summary = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "manifest": os.path.abspath(args.manifest),
+            "settings": {"jobs": args.jobs, "render_workers": args.render_workers, "chunk_seconds": args.chunk_seconds},
+            "rendered": len(results),
+            "skipped": len(jobs) - len(pending),
+            "failed": failures,
+            "wall_seconds": round(wall_seconds, 3),
+            "results": results,
+        }
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=4)
+        print(f"Report written to {args.report}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
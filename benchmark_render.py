@@ -0,0 +1,247 @@
+"""Reproducible, offline benchmark for the subtitle render pipeline.
+
+Generates synthetic test videos and Whisper-style transcripts, renders them
+against the templates in Templates/ (box on/off, multi-line, emoji) and
+reports frames/sec, per-frame overlay latency percentiles and peak RSS.
+
+    python benchmark_render.py --resolutions 720p,1080p --output results.json
+    python benchmark_render.py --baseline baseline.json   # exit 1 on regression
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import ffmpeg
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module; peak RSS is reported as missing
+    resource = None
+
+from ffmpeg_io import probe_video, iter_video_frames
+from subtitle_renderer import compile_subtitle_plan, apply_subtitle_style, render_subtitle_video
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+DENSITIES = {
+    # words per second, words per segment, seconds of silence between segments
+    "sparse": (1.5, 6, 1.5),
+    "normal": (2.5, 14, 0.5),
+    "dense": (4.0, 30, 0.1),
+}
+EMOJI_ASSET = os.path.join("assets", "jesus-christ-98.png")
+WORDS = "come my beloved child walk with me take hand and let us journey together in presence you will find peace".split()
+
+
+def generate_video(path, width, height, duration, fps):
+    """Renders a moving test pattern with a tone so every frame differs."""
+    if os.path.exists(path):
+        return
+    video = ffmpeg.input(f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}", format="lavfi")
+    audio = ffmpeg.input(f"sine=frequency=440:duration={duration}", format="lavfi")
+    (
+        ffmpeg.output(video, audio, path, vcodec="libx264", preset="ultrafast", g=fps * 2, acodec="aac", shortest=None)
+        .global_args("-loglevel", "error")
+        .overwrite_output()
+        .run()
+    )
+
+
+def generate_transcript(duration, density, seed=0):
+    """Builds a deterministic transcript in the audio.json segments/words schema."""
+    words_per_second, words_per_segment, gap = DENSITIES[density]
+    rng = random.Random(seed)
+    word_seconds = 1.0 / words_per_second
+    segments, t = [], 0.0
+
+    while t < duration:
+        words = []
+        for _ in range(words_per_segment):
+            if t >= duration:
+                break
+            length = word_seconds * rng.uniform(0.6, 1.0)
+            words.append({"word": " " + rng.choice(WORDS), "start": round(t, 2), "end": round(t + length, 2), "probability": 0.9})
+            t += word_seconds
+        text = "".join(w["word"] for w in words)
+        segments.append({
+            "id": len(segments),
+            "seek": 0,
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "text": text,
+            "tokens": [],
+            "temperature": 0.0,
+            "avg_logprob": -0.1,
+            "compression_ratio": 1.5,
+            "no_speech_prob": 0.01,
+            "words": words,
+        })
+        t += gap
+
+    return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "en"}
+
+
+def template_variants(template_dir="Templates"):
+    """Expands each template into box on/off, multi-line and emoji variants."""
+    variants = {}
+    for filename in sorted(os.listdir(template_dir)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(template_dir, filename), "r") as f:
+            base = json.load(f)
+        name = filename[:-len(".json")]
+
+        for variant, options in {
+            "plain": {"show_box": False, "multi_line": False},
+            "box": {"show_box": True, "multi_line": False},
+            "multiline": {"show_box": True, "multi_line": True},
+        }.items():
+            template = copy.deepcopy(base)
+            template.setdefault("content_positioning", {}).update(options)
+            template.pop("emoji_config", None)
+            variants[f"{name}-{variant}"] = template
+
+        template = copy.deepcopy(variants[f"{name}-box"])
+        template["emoji_config"] = {**base.get("emoji_config", {}), "emoji_path": EMOJI_ASSET}
+        variants[f"{name}-emoji"] = template
+    return variants
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+def run_case(case, video_path, transcript, template, full_render, output_dir):
+    """Runs one benchmark case; called in a fresh process so peak RSS is per case."""
+    info = probe_video(video_path)
+    plan = compile_subtitle_plan(transcript, template, info["width"], info["height"])
+
+    # Overlay latency alone, excluding decode and encode
+    latencies = []
+    clock = time.perf_counter
+    for frame_index, frame in enumerate(iter_video_frames(video_path, info["width"], info["height"])):
+        started = clock()
+        apply_subtitle_style(frame, plan, frame_index / info["fps"])
+        latencies.append(clock() - started)
+
+    overlay_seconds = sum(latencies)
+    result = {
+        "case": case,
+        "frames": len(latencies),
+        "overlay_fps": round(len(latencies) / overlay_seconds, 2) if overlay_seconds else None,
+        "latency_ms": {
+            f"p{int(p * 100)}": round(percentile(latencies, p) * 1000, 4) for p in (0.5, 0.9, 0.95, 0.99)
+        },
+    }
+
+    if full_render:
+        report = render_subtitle_video(video_path, transcript, template, os.path.join(output_dir, case.replace("/", "_") + ".mp4"))
+        result["render_fps"] = report["fps"]
+        result["stage_ms_per_frame"] = report["stage_ms_per_frame"]
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where the platform can't report it."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1)
+
+
+def format_value(value, width):
+    """Right-aligns a result for the summary line, with missing values shown as n/a."""
+    return f"{'n/a' if value is None else value:>{width}}"
+
+
+def compare(results, baseline, tolerance):
+    """Lists cases that got slower than the baseline by more than tolerance."""
+    previous = {r["case"]: r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get(result["case"])
+        if before is None:
+            continue
+        for metric in ("overlay_fps", "render_fps"):
+            old, new = before.get(metric), result.get(metric)
+            if old and new and new < old * (1 - tolerance):
+                regressions.append(f"{result['case']}: {metric} {old} -> {new}")
+        old, new = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        if old and new > old * (1 + tolerance):
+            regressions.append(f"{result['case']}: p95 latency {old}ms -> {new}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", default="720p,1080p,4k", help="Comma list of " + ",".join(RESOLUTIONS))
+    parser.add_argument("--densities", default=",".join(DENSITIES), help="Comma list of " + ",".join(DENSITIES))
+    parser.add_argument("--templates", default=None, help="Comma list of template variants (default: all)")
+    parser.add_argument("--duration", type=int, default=10, help="Seconds of synthetic video per case")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--full-render", action="store_true", help="Also time a full decode/overlay/encode render")
+    parser.add_argument("--workdir", default="bench_work", help="Where synthetic inputs are generated")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="Results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before failing (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    variants = template_variants()
+    selected = args.templates.split(",") if args.templates else list(variants)
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for resolution in args.resolutions.split(","):
+        width, height = RESOLUTIONS[resolution]
+        video_path = os.path.join(args.workdir, f"synthetic_{resolution}_{args.duration}s_{args.fps}fps.mp4")
+        generate_video(video_path, width, height, args.duration, args.fps)
+
+        for density in args.densities.split(","):
+            transcript = generate_transcript(args.duration, density)
+            for name in selected:
+                case = f"{resolution}/{density}/{name}"
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(
+                        run_case, case, video_path, transcript, variants[name], args.full_render, args.workdir
+                    ).result()
+                results.append(result)
+                print(
+                    f"{case:40s} {format_value(result['overlay_fps'], 9)} overlay fps  "
+                    f"p95 {format_value(result['latency_ms']['p95'], 8)} ms  {format_value(result['peak_rss_mb'], 7)} MB"
+                )
+
+    summary = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "settings": {"duration": args.duration, "fps": args.fps, "full_render": args.full_render},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(summary, f, indent=4)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
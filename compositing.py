@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+
+def clip_region(frame_shape, x, y, width, height):
+    """Intersects an overlay placed at (x, y) with the frame.
+
+    Returns (frame slices, overlay slices), or None if nothing is visible.
+    """
+    frame_height, frame_width = frame_shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + width, frame_width), min(y + height, frame_height)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (
+        (slice(y0, y1), slice(x0, x1)),
+        (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x)),
+    )
+
+
+def blend_roi(roi, color, inverse_alpha):
+    """In place: roi = color + roi * inverse_alpha / 255, in uint16 fixed point.
+
+    color is premultiplied and inverse_alpha is 255 - alpha; both are unsigned
+    integers that broadcast over every channel at once. The division by 255 is the
+    exact rounded (t + 128 + ((t + 128) >> 8)) >> 8 form.
+    """
+    blended = roi.astype(np.uint16)
+    blended *= inverse_alpha
+    blended += 128
+    blended += blended >> 8
+    blended >>= 8
+    blended += color
+    np.minimum(blended, 255, out=blended)
+    roi[:] = blended
+
+
+def blend_premultiplied(frame, x, y, pixels):
+    """Composites a premultiplied BGRA overlay onto the frame at (x, y), clipped to its edges."""
+    region = clip_region(frame.shape, x, y, pixels.shape[1], pixels.shape[0])
+    if region is None:
+        return
+    frame_region, overlay_region = region
+
+    overlay = pixels[overlay_region]
+    blend_roi(frame[frame_region], overlay[:, :, :3], 255 - overlay[:, :, 3:4])
+
+
+def fill_rect(frame, x, y, width, height, color, opacity):
+    """Composites a solid BGR rectangle with the given opacity, clipped to the frame."""
+    region = clip_region(frame.shape, x, y, width, height)
+    if region is None:
+        return
+
+    alpha = int(round(opacity * 255))
+    premultiplied = np.array([(c * alpha + 127) // 255 for c in color], np.uint16)
+    blend_roi(frame[region[0]], premultiplied, np.uint16(255 - alpha))
+
+
+def dilate_mask(mask, radius):
+    """Grows an alpha mask by radius pixels with a round kernel; this is how text outlines are made."""
+    if radius <= 0:
+        return mask
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+    return cv2.dilate(mask, kernel)
+
+
+def blur_mask(mask, radius):
+    """Separable Gaussian blur of an alpha mask over a (2 * radius + 1)-pixel kernel."""
+    if radius <= 0:
+        return mask
+    kernel = cv2.getGaussianKernel(2 * radius + 1, -1)
+    return cv2.sepFilter2D(mask, -1, kernel, kernel, borderType=cv2.BORDER_CONSTANT)
+
+
+def shift_mask(mask, dx, dy):
+    """Moves an alpha mask by (dx, dy) pixels; what moves past an edge is dropped."""
+    shifted = np.zeros_like(mask)
+    height, width = mask.shape[:2]
+    if abs(dx) < width and abs(dy) < height:
+        shifted[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = \
+            mask[max(-dy, 0):height + min(-dy, 0), max(-dx, 0):width + min(-dx, 0)]
+    return shifted
+
+
+def shadow_mask(mask, dx, dy, blur, opacity):
+    """The drop shadow (or, with no offset, the glow) cast by an alpha mask."""
+    shadow = blur_mask(shift_mask(mask, dx, dy), blur)
+    return shadow if opacity >= 1.0 else (shadow * opacity).astype(np.uint8)
+
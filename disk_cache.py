@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Root for every on-disk cache; override with AVS_CACHE_DIR
+CACHE_ROOT = os.environ.get("AVS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "audiovisual-studio"))
+RESCAN_SECONDS = 10.0  # Longest a DiskCache goes without counting other processes' writes
+
+
+def cache_dir(name):
+    """Returns (and creates) the cache subdirectory for one kind of cached data."""
+    path = os.path.join(CACHE_ROOT, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_atomic(path, data):
+    """Writes a cache file so concurrent jobs never see it half-written."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class DiskCache:
+    """Size-bounded LRU of files in one cache directory.
+
+    The app and every job worker keep a DiskCache over the same directory.
+    Each tracks its index (key -> size, in last-use order) as it reads and
+    writes, and rebuilds it from the files and their mtimes at startup, when
+    its own count passes max_bytes, and on a write at least RESCAN_SECONDS
+    after the last rescan. Other writes are O(1), and the directory outgrows
+    max_bytes by at most what other processes wrote since the last rescan.
+    Hits and writes stamp the mtime, so the LRU order is shared and survives
+    restarts. Writes are atomic, so concurrent processes never read a
+    partial entry, and an entry another process evicts mid-read counts as a
+    miss.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.directory = cache_dir(name)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._total = 0
+        self._scanned = 0.0
+        self._scan()
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".tmp"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # Evicted by another process while scanning
+                    continue
+                entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._total = sum(self._index.values())
+        self._scanned = time.monotonic()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    @staticmethod
+    def _touch(path):
+        # An explicit, full-resolution stamp: the filesystem's own clock is too coarse to order rapid uses
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _use(self, key, size):
+        self._total += size - self._index.pop(key, 0)
+        self._index[key] = size
+
+    def _forget(self, key):
+        with self._lock:
+            if key in self._index:
+                self._total -= self._index.pop(key)
+
+    def get_path(self, key):
+        """Returns the entry's file path and marks it recently used, or None on a miss."""
+        path = self.path(key)
+        try:
+            self._touch(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            self._forget(key)
+            return None
+        with self._lock:
+            self._use(key, size)
+        return path
+
+    def get_bytes(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:  # Evicted by another process since get_path
+            self._forget(key)
+            return None
+
+    def put_bytes(self, key, data):
+        temp_path = f"{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        return self.put_file(key, temp_path)
+
+    def put_file(self, key, source_path):
+        """Moves a finished file into the cache (same filesystem) and evicts down to max_bytes."""
+        path = self.path(key)
+        os.replace(source_path, path)
+        self._touch(path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._use(key, size)
+            if self._total > self.max_bytes or time.monotonic() - self._scanned > RESCAN_SECONDS:
+                # Other processes write to the same directory, so evict against what is actually on disk
+                self._scan()
+                if key in self._index:
+                    self._index.move_to_end(key)
+                self._evict(key)
+        return path
+
+    def _evict(self, keep):
+        # Never evict the entry that was just written
+        for key in list(self._index):
+            if self._total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._total -= self._index.pop(key)
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,82 @@
+"""Headless API for the studio's heavy work: rendering, transcription, TTS and encodes.
+
+Nothing here imports Streamlit, so the same calls back the tools, the job
+queue workers and the batch CLI (batch_render.py).
+"""
+import asyncio
+import json
+
+from ffmpeg_io import encode_still_video
+from long_form_transcription import transcribe_long_audio
+from transcription_cache import cached_transcription, hash_file
+from transcription_service import get_transcription_service, DEFAULT_MODEL
+from template_registry import get_template_registry
+from tts_synthesis import generate_audio, synthesize_long_text, DEFAULT_CONCURRENCY
+
+def template_path(template):
+    """The file a template name or path refers to, or None for the built-in default."""
+    if not isinstance(template, str) or not template or template == "Default":
+        return None
+    return template if template.endswith(".json") else get_template_registry().path(template)
+
+
+def render_subtitles(video_path, transcript_path, output_path, template=None, workers=1, chunk_seconds=None,
+                     report_path=None, on_progress=None, cores=None):
+    """Renders a transcript (audio.json schema) over a video; returns the render report.
+
+    template is a name in Templates/, a .json path, a dict or None for the
+    default style; it is validated and compiled through the template registry.
+    cores caps the threads the render uses when other jobs share the machine.
+    """
+    from subtitle_renderer import render_subtitle_video, DEFAULT_CHUNK_SECONDS  # OpenCV is only loaded to render
+
+    with open(transcript_path, "r") as f:
+        subtitle_data = json.load(f)
+    return render_subtitle_video(
+        video_path, subtitle_data, template, output_path, workers=workers,
+        chunk_seconds=chunk_seconds or DEFAULT_CHUNK_SECONDS, report_path=report_path, on_progress=on_progress,
+        cores=cores,
+    )
+
+
+def transcribe_audio(audio_path, model_name=DEFAULT_MODEL, audio_hash=None, long_form=False, workers=None, cores=None):
+    """Transcribes audio with the resident model; repeat audio is served from cache.
+
+    long_form splits the audio on silence and transcribes the chunks in
+    parallel, the workers sharing cores (default: the whole machine).
+    """
+    service = get_transcription_service(model_name=model_name)
+    options = {"word_timestamps": True}
+    transcribe = lambda: service.transcribe(audio_path)
+    if long_form:
+        options["long_form"] = True
+        transcribe = lambda: transcribe_long_audio(
+            audio_path, service.backend_name, model_name, workers=workers, cores=cores,
+        )
+    return cached_transcription(audio_hash or hash_file(audio_path), service.backend_name, model_name, options, transcribe)
+
+
+def write_timestamps(timestamps, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(timestamps, f, indent=4, ensure_ascii=False)
+
+
+def synthesize_speech(text, voice, output_path, words_path=None, long_text=False, concurrency=DEFAULT_CONCURRENCY,
+                      on_progress=None):
+    """Speaks text to an MP3; returns the number of chunks synthesized.
+
+    long_text splits the script on sentences and synthesizes chunks
+    concurrently (word timestamps are not collected then); otherwise the
+    WordBoundary events are saved to words_path when given.
+    """
+    if long_text:
+        return asyncio.run(synthesize_long_text(
+            text, voice, output_path, concurrency=concurrency, on_progress=on_progress,
+        ))
+    asyncio.run(generate_audio(text, voice, output_path, words_path))
+    return 1
+
+
+def still_video(audio_path, output_path, width, height, image_path=None, color="0x00FF00"):
+    """Encodes audio over a still image or colour (see ffmpeg_io.encode_still_video)."""
+    encode_still_video(audio_path, output_path, width, height, image_path=image_path, color=color)
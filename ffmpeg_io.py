@@ -0,0 +1,279 @@
+import os
+import re
+import threading
+from collections import deque
+
+import ffmpeg
+import numpy as np
+
+STILL_FPS = 1  # A static background only needs a frame per second
+MP4_AUDIO_CODECS = ("aac", "mp3")  # Audio that can be stream-copied into an MP4
+
+
+def parse_rate(rate):
+    """Converts an ffprobe rate string such as '30000/1001' to a float."""
+    num, _, den = rate.partition("/")
+    return float(num) / float(den or 1)
+
+
+def probe_video(path):
+    """Reads the stream details needed to decode and re-encode a video."""
+    info = ffmpeg.probe(path)
+    video = next(s for s in info["streams"] if s["codec_type"] == "video")
+    rate = video.get("avg_frame_rate", "0/0")
+    if rate.startswith("0"):
+        rate = video["r_frame_rate"]
+
+    return {
+        "width": int(video["width"]),
+        "height": int(video["height"]),
+        "rate": rate,  # Exact frame rate string, passed back to the encoder
+        "fps": parse_rate(rate),
+        "duration": float(info["format"].get("duration", 0.0)),
+        "start_time": float(video.get("start_time", 0.0)),
+        "has_audio": any(s["codec_type"] == "audio" for s in info["streams"]),
+    }
+
+
+def probe_keyframe_times(path):
+    """Lists the presentation times of the video's keyframes from its packet index."""
+    info = ffmpeg.probe(path, select_streams="v:0", show_entries="packet=pts_time,flags")
+    return sorted(
+        float(packet["pts_time"])
+        for packet in info.get("packets", [])
+        if "K" in packet.get("flags", "") and packet.get("pts_time") not in (None, "N/A")
+    )
+
+
+def probe_duration(path):
+    """Returns a media file's duration in seconds from its container."""
+    return float(ffmpeg.probe(path)["format"].get("duration", 0.0))
+
+
+def detect_silences(path, noise_db=-35, min_seconds=0.4):
+    """Lists (start, end) times of stretches quieter than noise_db for at least min_seconds."""
+    _, log = (
+        ffmpeg.input(path)
+        .audio.filter("silencedetect", noise=f"{noise_db}dB", d=min_seconds)
+        .output("-", format="null")
+        .global_args("-nostats")
+        .run(capture_stderr=True)
+    )
+    log = log.decode("utf-8", "replace")
+    starts = [max(0.0, float(t)) for t in re.findall(r"silence_start: (-?[\d.]+)", log)]
+    ends = [float(t) for t in re.findall(r"silence_end: (-?[\d.]+)", log)]
+    # Silence running to the end of the file has no silence_end
+    return [(start, ends[i] if i < len(ends) else None) for i, start in enumerate(starts)]
+
+
+def extract_audio_clip(path, output_path, start, duration=None, sample_rate=16000):
+    """Writes start..start+duration of a file's audio as a mono 16-bit WAV."""
+    output_kwargs = {"ac": 1, "ar": sample_rate, "acodec": "pcm_s16le"}
+    if duration is not None:
+        output_kwargs["t"] = duration
+    (
+        ffmpeg.input(path, ss=start)
+        .audio.output(output_path, **output_kwargs)
+        .global_args("-loglevel", "error")
+        .overwrite_output()
+        .run()
+    )
+
+
+def encode_still_video(audio_path, output_path, width, height, image_path=None, color="0x00FF00", fps=STILL_FPS):
+    """Encodes one background frame looped over an audio track.
+
+    The background is the image at image_path, scaled and padded to fit, or
+    a solid color. x264 runs with still-image tuning at a minimal frame rate,
+    and AAC or MP3 audio is stream-copied (anything else is transcoded once).
+    """
+    info = ffmpeg.probe(audio_path)
+    duration = float(info["format"]["duration"])
+    audio_codec = next((s["codec_name"] for s in info["streams"] if s["codec_type"] == "audio"), None)
+
+    if image_path:
+        background = (
+            ffmpeg.input(image_path, framerate=fps)
+            .video.filter("scale", width, height, force_original_aspect_ratio="decrease")
+            .filter("pad", width, height, "(ow-iw)/2", "(oh-ih)/2", color=color)
+            .filter("setsar", 1)
+        )
+    else:
+        background = ffmpeg.input(f"color=c={color}:s={width}x{height}:r={fps}:d={1 / fps}", format="lavfi").video
+
+    # Convert the single frame once, then let the loop filter repeat it
+    video = background.filter("format", "yuv420p").filter("loop", loop=-1, size=1)
+    (
+        ffmpeg.output(video, ffmpeg.input(audio_path).audio, output_path, **still_output_options(audio_codec, duration, fps))
+        .global_args("-loglevel", "error")
+        .overwrite_output()
+        .run(capture_stderr=True)
+    )
+
+
+def still_output_options(audio_codec, duration, fps):
+    """x264 still-image settings, with the audio copied when the MP4 can carry it."""
+    output_kwargs = {
+        "vcodec": "libx264",
+        "tune": "stillimage",
+        "preset": "ultrafast",
+        "pix_fmt": "yuv420p",
+        "r": fps,
+        "g": fps * 30,  # Repeated frames cost almost nothing; keyframes are what take time and space
+        "t": duration,
+        "movflags": "+faststart",
+    }
+    output_kwargs.update(audio_output_options(audio_codec))
+    return output_kwargs
+
+
+def probe_audio_codec(path):
+    """Returns the codec name of a file's first audio stream, or None."""
+    info = ffmpeg.probe(path, select_streams="a:0")
+    return next((s["codec_name"] for s in info["streams"] if s.get("codec_type") == "audio"), None)
+
+
+def audio_output_options(audio_codec):
+    """Stream-copies audio an MP4 can carry; anything else (PCM, Vorbis, Opus...) is transcoded to AAC once."""
+    if audio_codec in MP4_AUDIO_CODECS:
+        return {"acodec": "copy"}
+    return {"acodec": "aac", "audio_bitrate": "192k"}
+
+
+def read_exact(stream, size):
+    """Reads exactly size bytes into a writable buffer, or None at end of stream."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    filled = 0
+    while filled < size:
+        count = stream.readinto(view[filled:])
+        if not count:
+            return None
+        filled += count
+    return buffer
+
+
+def collect_stderr(process, lines=20):
+    """Drains a piped ffmpeg's stderr on a thread, keeping its last lines.
+
+    Draining means a stream of decode errors can never fill the pipe and
+    stall ffmpeg. Returns (thread, lines); join the thread before reading.
+    """
+    tail = deque(maxlen=lines)
+    reader = threading.Thread(target=tail.extend, args=(process.stderr,), daemon=True)
+    reader.start()
+    return reader, tail
+
+
+def check_decoder(process, reader, tail, path):
+    """Waits for a decoding ffmpeg and raises RuntimeError with its messages if it failed."""
+    process.wait()
+    reader.join()
+    if process.returncode != 0:
+        detail = b"".join(tail).decode("utf-8", "replace").strip()
+        raise RuntimeError(f"ffmpeg failed decoding {path} (status {process.returncode}): {detail}")
+
+
+def iter_video_frames(path, width, height, start=None, frame_count=None):
+    """Decodes a video to writable BGR frames through an ffmpeg pipe.
+
+    Raises RuntimeError, with ffmpeg's last messages, if decoding fails
+    before the end; a consumer that stops early on purpose is not an error.
+    """
+    input_kwargs = {"ss": start} if start else {}
+    # Passthrough keeps ffmpeg from duplicating frames to fill a seek offset
+    output_kwargs = {"format": "rawvideo", "pix_fmt": "bgr24", "vsync": "passthrough"}
+    if frame_count is not None:
+        output_kwargs["frames:v"] = frame_count
+
+    process = (
+        ffmpeg.input(path, **input_kwargs)
+        .video.output("pipe:", **output_kwargs)
+        .global_args("-loglevel", "error")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+    reader, errors = collect_stderr(process)
+
+    frame_size = width * height * 3
+    reached_end = False
+    try:
+        while True:
+            buffer = read_exact(process.stdout, frame_size)
+            if buffer is None:
+                reached_end = True
+                break
+            yield np.frombuffer(buffer, np.uint8).reshape(height, width, 3)
+    finally:
+        process.stdout.close()
+        process.wait()
+        reader.join()
+        process.stderr.close()
+    if reached_end:
+        check_decoder(process, reader, errors, path)
+
+
+def open_video_encoder(output_path, width, height, rate, audio_source=None, crf=18, preset="medium", threads=None):
+    """Starts one libx264 encode fed with raw BGR frames on stdin.
+
+    When audio_source is given its audio stream is muxed in, stream-copied
+    when the MP4 can carry it.
+    """
+    streams = [ffmpeg.input("pipe:", format="rawvideo", pix_fmt="bgr24", s=f"{width}x{height}", framerate=rate).video]
+    output_kwargs = {"vcodec": "libx264", "pix_fmt": "yuv420p", "crf": crf, "preset": preset, "movflags": "+faststart"}
+    if threads:
+        output_kwargs["threads"] = threads
+    if audio_source:
+        streams.append(ffmpeg.input(audio_source).audio)
+        output_kwargs.update(audio_output_options(probe_audio_codec(audio_source)))
+
+    return (
+        ffmpeg.output(*streams, output_path, **output_kwargs)
+        .global_args("-loglevel", "error")
+        .overwrite_output()
+        .run_async(pipe_stdin=True)
+    )
+
+
+def write_frame(process, frame):
+    """Sends one BGR frame to an encoder started by open_video_encoder."""
+    process.stdin.write(np.ascontiguousarray(frame).data)
+
+
+def close_encoder(process):
+    """Flushes the encoder and raises if ffmpeg failed."""
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg exited with status {process.returncode}")
+
+
+def concat_list_entry(path):
+    """One concat demuxer line; a quote in the path is closed, escaped and reopened ('\\'')."""
+    quoted = os.path.abspath(path).replace("'", "'\\''")
+    return f"file '{quoted}'\n"
+
+
+def concat_videos(part_paths, output_path, audio_source=None):
+    """Joins encoded parts with the concat demuxer, without re-encoding the video.
+
+    When audio_source is given its audio stream is muxed in, stream-copied
+    when the MP4 can carry it.
+    """
+    list_path = output_path + ".parts.txt"
+    with open(list_path, "w") as f:
+        for part_path in part_paths:
+            f.write(concat_list_entry(part_path))
+
+    try:
+        streams = [ffmpeg.input(list_path, format="concat", safe=0).video]
+        output_kwargs = {"vcodec": "copy", "movflags": "+faststart"}
+        if audio_source:
+            streams.append(ffmpeg.input(audio_source).audio)
+            output_kwargs.update(audio_output_options(probe_audio_codec(audio_source)))
+        (
+            ffmpeg.output(*streams, output_path, **output_kwargs)
+            .global_args("-loglevel", "error")
+            .overwrite_output()
+            .run()
+        )
+    finally:
+        os.remove(list_path)
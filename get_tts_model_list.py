@@ -1,16 +1,12 @@
-import asyncio
-from edge_tts import VoicesManager
+from voice_catalogue import get_voice_catalogue
+
+def list_voices():
+    # Load the shared voice catalogue (cached on disk, refreshed when stale)
+    voices = get_voice_catalogue().voices
 
-async def list_voices():
-    # Create a VoicesManager instance
-    voices_manager = await VoicesManager.create()
-    
-    # Access the list of voices
-    voices = voices_manager.voices
-    
     # Print details of each voice
     for voice in voices:
         print(f"Name: {voice['Name']}, Gender: {voice['Gender']}, Locale: {voice['Locale']}")
 
-# Run the async function
-asyncio.run(list_voices())
\ No newline at end of file
+if __name__ == "__main__":
+    list_voices()
@@ -0,0 +1,314 @@
+"""Subtitle text engines: TrueType through a cached glyph atlas, or OpenCV's Hershey font.
+
+A GlyphAtlas exists once per process for each (font file, pixel size,
+synthetic bold/italic). Pillow rasterizes every glyph into an alpha bitmap
+exactly once, together with its bearings and advance, and each kerning
+pair is measured once. Words are then composed from those bitmaps with
+numpy, so drawing real-font text costs about the same as cv2.putText.
+
+Both engines have the same interface (text_size, ink_box, draw and an
+outline width for compositing.dilate_mask). The renderer and the template
+designer's preview don't care which one they get. Hershey is used when a
+template's font cannot be found or Pillow is missing.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HERSHEY_FONT = cv2.FONT_HERSHEY_SIMPLEX
+# A font_size of 1.0 gives capitals about as tall as Hershey's at scale 1.0 (about 22 px)
+TRUETYPE_PIXELS_PER_SCALE = 31
+ITALIC_SHEAR = 0.2  # Horizontal shear per pixel of height for fonts without an italic face
+
+# Where fonts are looked up: AVS_FONT_DIRS (os.pathsep-separated), the app's fonts/ folder, then the system's
+FONT_DIRS = [d for d in os.environ.get("AVS_FONT_DIRS", "").split(os.pathsep) if d] + [
+    os.path.join(APP_DIR, "fonts"),
+    os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+    os.path.expanduser("~/.fonts"),
+    os.path.expanduser("~/.local/share/fonts"),
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    "/Library/Fonts",
+    "/System/Library/Fonts",
+]
+
+# Metric-compatible (or at least similar) stand-ins for the designer's Windows fonts
+FONT_ALIASES = {
+    "arial": ["arial", "liberationsans", "arimo", "dejavusans"],
+    "times": ["times", "timesnewroman", "liberationserif", "tinos", "dejavuserif"],
+    "timesnewroman": ["times", "timesnewroman", "liberationserif", "tinos", "dejavuserif"],
+    "cour": ["cour", "couriernew", "liberationmono", "cousine", "dejavusansmono"],
+    "couriernew": ["cour", "couriernew", "liberationmono", "cousine", "dejavusansmono"],
+    "verdana": ["verdana", "dejavusans"],
+}
+
+# File-name suffixes of each face, Windows style (arialbd) and family-style (DejaVuSans-Bold)
+FACE_SUFFIXES = {
+    (False, False): ["", "-regular", "regular", "-roman"],
+    (True, False): ["bd", "b", "-bold", "bold"],
+    (False, True): ["i", "-italic", "italic", "-oblique", "oblique"],
+    (True, True): ["bi", "z", "-bolditalic", "bolditalic", "-boldoblique", "boldoblique"],
+}
+
+
+def normalize_font_name(name):
+    """'Arial', 'arial.ttf' and 'Times New Roman' -> 'arial', 'arial', 'timesnewroman'."""
+    name = os.path.splitext(os.path.basename(name))[0] if name.lower().endswith((".ttf", ".otf", ".ttc")) else name
+    return re.sub(r"[\s_]+", "", name.lower())
+
+
+_font_index = None
+_font_index_lock = threading.Lock()
+
+
+def font_index():
+    """Normalized file name -> path of every font in FONT_DIRS; built once per process."""
+    global _font_index
+    with _font_index_lock:
+        if _font_index is None:
+            index = {}
+            for font_dir in FONT_DIRS:
+                for root, _, files in os.walk(font_dir):
+                    for filename in files:
+                        if filename.lower().endswith((".ttf", ".otf", ".ttc")):
+                            index.setdefault(normalize_font_name(filename), os.path.join(root, filename))
+            _font_index = index
+        return _font_index
+
+
+def find_font(family, bold=False, italic=False):
+    """Finds a font file for a family and style.
+
+    Returns (path, synthetic_bold, synthetic_italic), where the flags say
+    which styles the file lacks and must be faked, or None if nothing
+    matches. family may also be a path to a font file.
+    """
+    if family and os.path.isfile(family):
+        return family, bold, italic
+    if not family:
+        return None
+    index = font_index()
+    base = normalize_font_name(family)
+    # Prefer the requested face of any alias, then fall back to faking the missing styles
+    for wanted_bold, wanted_italic in dict.fromkeys([(bold, italic), (bold, False), (False, italic), (False, False)]):
+        for stem in FONT_ALIASES.get(base, [base]):
+            for suffix in FACE_SUFFIXES[(wanted_bold, wanted_italic)]:
+                path = index.get(stem + suffix)
+                if path:
+                    return path, bold and not wanted_bold, italic and not wanted_italic
+    return None
+
+
+class GlyphAtlas:
+    """Alpha bitmaps, bearings and advances of one font at one size, rasterized on first use."""
+
+    def __init__(self, path, size, synthetic_bold=False, synthetic_italic=False):
+        from PIL import Image, ImageDraw, ImageFont  # Only needed once a TrueType font is in use
+
+        self.Image, self.ImageDraw = Image, ImageDraw
+        self.font = ImageFont.truetype(path, size)
+        self.size = size
+        self.stroke = max(1, size // 24) if synthetic_bold else 0  # Faux bold: thicken every glyph
+        self.synthetic_italic = synthetic_italic
+        self.ascent, self.descent = self.font.getmetrics()
+        self.glyphs = {}
+        self.kerning = {}
+        self._lock = threading.Lock()
+
+    def glyph(self, char):
+        """(mask, left, top, advance) with left/top relative to the pen position on the baseline."""
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            with self._lock:
+                glyph = self.glyphs.get(char) or self._rasterize(char)
+                self.glyphs[char] = glyph
+        return glyph
+
+    def _rasterize(self, char):
+        advance = self.font.getlength(char) + self.stroke
+        left, top, right, bottom = self.font.getbbox(char, anchor="ls", stroke_width=self.stroke)
+        if right <= left or bottom <= top:
+            return None, 0, 0, advance  # Whitespace
+
+        image = self.Image.new("L", (right - left, bottom - top), 0)
+        self.ImageDraw.Draw(image).text(
+            (-left, -top), char, font=self.font, fill=255, anchor="ls", stroke_width=self.stroke, stroke_fill=255,
+        )
+        mask = np.asarray(image, dtype=np.uint8)
+        if self.synthetic_italic:
+            # Shear about the baseline: rows above it move right, rows below it move left
+            height, width = mask.shape
+            shift = int(np.ceil(ITALIC_SHEAR * bottom))  # Keeps the lowest row's shift non-negative
+            matrix = np.float32([[1, -ITALIC_SHEAR, shift - ITALIC_SHEAR * top], [0, 1, 0]])
+            mask = cv2.warpAffine(mask, matrix, (width + int(np.ceil(ITALIC_SHEAR * height)) + 1, height),
+                                  flags=cv2.INTER_LINEAR)
+            left -= shift
+        return np.ascontiguousarray(mask), left, top, advance
+
+    def kern(self, first, second):
+        """Extra advance between two characters (negative for pairs like "AV")."""
+        pair = first + second
+        value = self.kerning.get(pair)
+        if value is None:
+            value = self.font.getlength(pair) - self.font.getlength(first) - self.font.getlength(second)
+            self.kerning[pair] = value
+        return value
+
+    def layout(self, text):
+        """Pen positions of each character and the total advance, with kerning applied."""
+        positions, pen, previous = [], 0.0, None
+        for char in text:
+            if previous is not None:
+                pen += self.kern(previous, char)
+            positions.append((char, pen))
+            pen += self.glyph(char)[3]
+            previous = char
+        return positions, pen
+
+
+class TrueTypeText:
+    """Text drawn from a GlyphAtlas; outline is the stroke width in pixels around the glyphs."""
+
+    def __init__(self, atlas, outline):
+        self.atlas = atlas
+        self.outline = outline
+        self._sizes = {}
+        self._boxes = {}
+
+    def text_size(self, text):
+        """((width, height above baseline), depth below baseline), like cv2.getTextSize."""
+        size = self._sizes.get(text)
+        if size is None:
+            positions, width = self.atlas.layout(text)
+            top = bottom = 0
+            for char, _ in positions:
+                mask, _, glyph_top, _ = self.atlas.glyph(char)
+                if mask is not None:
+                    top = min(top, glyph_top)
+                    bottom = max(bottom, glyph_top + mask.shape[0])
+            size = self._sizes[text] = ((int(round(width)), -top), bottom)
+        return size
+
+    def ink_box(self, text):
+        """(left, top, right, bottom) around everything drawn for text, relative to its origin."""
+        box = self._boxes.get(text)
+        if box is None:
+            # The union of the placed glyph bitmaps: italic and overhanging glyphs reach past the advance
+            positions, _ = self.atlas.layout(text)
+            left = top = right = bottom = 0
+            for char, pen in positions:
+                glyph, glyph_left, glyph_top, _ = self.atlas.glyph(char)
+                if glyph is not None:
+                    gx = int(round(pen)) + glyph_left
+                    left, right = min(left, gx), max(right, gx + glyph.shape[1])
+                    top, bottom = min(top, glyph_top), max(bottom, glyph_top + glyph.shape[0])
+            pad = self.outline  # The outline is the ink dilated by this many pixels
+            box = self._boxes[text] = (left - pad, top - pad, right + pad, bottom + pad)
+        return box
+
+    def draw(self, mask, text, origin):
+        """Composes the text's glyphs into an alpha mask, baseline-left at origin."""
+        x, y = origin
+        mask_height, mask_width = mask.shape[:2]
+        positions, _ = self.atlas.layout(text)
+        for char, pen in positions:
+            glyph, left, top, _ = self.atlas.glyph(char)
+            if glyph is None:
+                continue
+            gx, gy = x + int(round(pen)) + left, y + top
+            x0, y0 = max(gx, 0), max(gy, 0)
+            x1, y1 = min(gx + glyph.shape[1], mask_width), min(gy + glyph.shape[0], mask_height)
+            if x1 > x0 and y1 > y0:
+                region = mask[y0:y1, x0:x1]
+                np.maximum(region, glyph[y0 - gy:y1 - gy, x0 - gx:x1 - gx], out=region)
+
+
+class HersheyText:
+    """OpenCV's built-in vector font; thickness is its stroke weight, and the outline is 1 pixel."""
+
+    outline = 1
+
+    def __init__(self, font_scale, thickness):
+        self.font_scale = font_scale
+        self.thickness = thickness
+
+    def text_size(self, text):
+        return cv2.getTextSize(text, HERSHEY_FONT, self.font_scale, self.thickness)
+
+    def ink_box(self, text):
+        (width, height), baseline = cv2.getTextSize(text, HERSHEY_FONT, self.font_scale, self.thickness)
+        pad = self.thickness + 2 * self.outline  # Anti-aliased strokes spill past the measured size
+        return -pad, -height - pad, width + pad, baseline + pad
+
+    def draw(self, mask, text, origin):
+        cv2.putText(mask, text, origin, HERSHEY_FONT, self.font_scale, 255, self.thickness, cv2.LINE_AA)
+
+
+_atlases = {}
+_engines = {}
+_engines_lock = threading.Lock()
+_warned = set()
+
+
+def get_atlas(path, size, synthetic_bold=False, synthetic_italic=False):
+    """The process-wide atlas for one font file, size and synthetic style."""
+    key = (path, size, synthetic_bold, synthetic_italic)
+    with _engines_lock:
+        atlas = _atlases.get(key)
+        if atlas is None:
+            atlas = _atlases[key] = GlyphAtlas(path, size, synthetic_bold, synthetic_italic)
+        return atlas
+
+
+def get_text_engine(font_family, font_scale, thickness, bold=False, italic=False):
+    """TrueType text for the family when its font can be found, else Hershey.
+
+    thickness is the template's stroke_thickness: Hershey's stroke weight, or
+    the TrueType outline width of (thickness + 1) // 2 pixels.
+    """
+    key = (font_family, font_scale, thickness, bold, italic)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    match = find_font(font_family, bold, italic)
+    if match is not None:
+        path, synthetic_bold, synthetic_italic = match
+        try:
+            size = max(1, int(round(font_scale * TRUETYPE_PIXELS_PER_SCALE)))
+            engine = TrueTypeText(get_atlas(path, size, synthetic_bold, synthetic_italic), (thickness + 1) // 2)
+        except (ImportError, OSError) as e:
+            reason = f"could not be loaded ({e})"
+    else:
+        reason = "was not found in " + os.pathsep.join(d for d in FONT_DIRS if os.path.isdir(d))
+    if engine is None:
+        if font_family not in _warned:
+            _warned.add(font_family)
+            logger.warning("Font %r %s; falling back to the Hershey font", font_family, reason)
+        engine = HersheyText(font_scale, thickness)
+
+    with _engines_lock:
+        return _engines.setdefault(key, engine)
+
+
+def main(argv=None):
+    """Shows which font file each family resolves to: python glyph_atlas.py arial.ttf times.ttf ..."""
+    for family in (argv if argv is not None else sys.argv[1:]) or ["arial.ttf", "times.ttf", "verdana.ttf", "cour.ttf"]:
+        for bold, italic in FACE_SUFFIXES:
+            match = find_font(family, bold, italic)
+            style = ("bold " if bold else "") + ("italic" if italic else "") or "regular"
+            print(f"{family:16s} {style:12s} {match[0] if match else 'Hershey fallback'}"
+                  + ("" if not match or not (match[1] or match[2]) else " (synthetic style)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
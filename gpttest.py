@@ -1,15 +1,7 @@
-import os
-# Set the path to the ImageMagick binary
-os.environ["IMAGEMAGICK_BINARY"] = r"C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe"
-
 import ffmpeg
-import vosk
-import json
-import wave
 import cv2
 import numpy as np
-import os
-from moviepy.editor import VideoFileClip
+from transcription_service import iter_vosk_words
 
 def extract_audio(video_path, audio_path):
     """Extract audio from the video."""
@@ -17,23 +9,8 @@ def extract_audio(video_path, audio_path):
 
 def transcribe_audio_vosk(audio_path, model_path="models/vosk-model-small-en-us-0.15"): 
     """Transcribe the audio using Vosk and get timestamps."""
-    wf = wave.open(audio_path, "rb")
-    model = vosk.Model(model_path)
-    recognizer = vosk.KaldiRecognizer(model, wf.getframerate())
-    recognizer.SetWords(True)
-    
-    transcript = []
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        if recognizer.AcceptWaveform(data):
-            result = json.loads(recognizer.Result())
-            if 'result' in result:
-                transcript.extend(result['result'])
-    
-    wf.close()
-    return transcript
+    # Streams PCM from ffmpeg into the shared model, including the final buffered words
+    return list(iter_vosk_words(audio_path, model_path))
 
 def generate_video_with_highlights(video_path, transcript, output_path="output.mp4"):
     """Overlay highlighted words onto the video using OpenCV."""
@@ -71,9 +48,8 @@ def generate_video_with_highlights(video_path, transcript, output_path="output.m
     return output_path
 
 # Example usage
-video_file = "input.mp4"
-audio_file = "audio.wav"
-extract_audio(video_file, audio_file)
-transcription = transcribe_audio_vosk(audio_file)
-final_video = generate_video_with_highlights(video_file, transcription)
-print(f"Processed video saved as {final_video}")
+if __name__ == "__main__":
+    video_file = "input.mp4"
+    transcription = transcribe_audio_vosk(video_file)
+    final_video = generate_video_with_highlights(video_file, transcription)
+    print(f"Processed video saved as {final_video}")
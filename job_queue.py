@@ -0,0 +1,541 @@
+"""Persistent background job queue for the heavy tools.
+
+Jobs are rows in a SQLite database and run in a fixed pool of worker
+processes, so renders, transcriptions and TTS survive browser refreshes and
+never run more than a machine's worth at once. Workers are started by the
+app on first use, or on their own with:
+
+    python job_queue.py --workers 2
+"""
+import argparse
+import hashlib
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import closing
+
+from disk_cache import CACHE_ROOT
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DB_PATH = os.environ.get("AVS_JOB_DB", os.path.join(CACHE_ROOT, "jobs.sqlite3"))
+# Each render also uses a process per chunk, so run at most one job per two cores;
+# 0 leaves the workers to a separate `python job_queue.py` process
+POOL_SIZE = int(os.environ.get("AVS_JOB_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+POLL_SECONDS = 0.5
+PROGRESS_WRITE_SECONDS = 0.5
+HEARTBEAT_SECONDS = 2.0
+STALE_SECONDS = 30.0  # A running job whose worker stopped heart-beating this long ago is requeued
+CANCEL_GRACE_SECONDS = 5.0  # Time a job gets to stop by itself before its worker is restarted
+MAX_ATTEMPTS = 3  # A job that keeps taking its worker down is failed rather than requeued forever
+
+ACTIVE_STATUSES = ("queued", "running")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    done REAL NOT NULL DEFAULT 0,
+    total REAL,
+    unit TEXT,
+    rate REAL,
+    eta REAL,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    heartbeat REAL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+# Columns added after the first release, for databases created before them
+ADDED_COLUMNS = {"owner": "TEXT"}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def connect():
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    db = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")  # Readers never wait for the workers' progress writes
+    db.executescript(SCHEMA)
+    columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+    for column, definition in ADDED_COLUMNS.items():
+        if column not in columns:
+            db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+    return db
+
+
+def job_from_row(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def submit_job(kind, params, start_workers=True, owner=None):
+    """Queues a job and returns its id; params must be JSON-serializable.
+
+    owner (see session_owner) is who may list and reattach to the job later.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}, expected one of {sorted(JOB_HANDLERS)}")
+    job_id = uuid.uuid4().hex
+    with closing(connect()) as db:
+        db.execute(
+            "INSERT INTO jobs (id, kind, params, status, owner, created) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, json.dumps(params), owner, time.time()),
+        )
+    if start_workers:
+        ensure_workers()
+    return job_id
+
+
+def get_job(job_id):
+    with closing(connect()) as db:
+        row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return job_from_row(row) if row else None
+
+
+def list_jobs(kind=None, owner=None, limit=20):
+    """Most recent jobs first, optionally only of one kind and/or one owner."""
+    filters = [(column, value) for column, value in (("kind", kind), ("owner", owner)) if value]
+    where = " AND ".join(f"{column} = ?" for column, _ in filters) or "1"
+    with closing(connect()) as db:
+        rows = db.execute(
+            f"SELECT * FROM jobs WHERE {where} ORDER BY created DESC LIMIT ?", [value for _, value in filters] + [limit],
+        ).fetchall()
+    return [job_from_row(row) for row in rows]
+
+
+def get_owned_job(job_id, owner):
+    """The job, or None if there is no such job or it was submitted by another owner."""
+    job = get_job(job_id) if job_id else None
+    if job is None or not owner or job["owner"] != owner:
+        return None
+    return job
+
+
+def queue_position(job_id):
+    """How many queued jobs are ahead of this one."""
+    with closing(connect()) as db:
+        row = db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < (SELECT created FROM jobs WHERE id = ?)",
+            (job_id,),
+        ).fetchone()
+    return row[0]
+
+
+def cancel_job(job_id):
+    """Cancels a queued job at once; a running job is asked to stop."""
+    now = time.time()
+    with closing(connect()) as db:
+        db.execute(
+            "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'", (now, job_id)
+        )
+        db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+
+
+def claim_job(worker_pid):
+    """Atomically moves the oldest queued job to running for this worker."""
+    now = time.time()
+    with closing(connect()) as db:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose worker died mid-run go back to the queue (or end, if cancellation was asked for)
+            db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? "
+                "WHERE status = 'running' AND heartbeat < ? AND cancel_requested = 1",
+                (now, now - STALE_SECONDS),
+            )
+            db.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = 'The worker running this job kept exiting' "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (now, now - STALE_SECONDS, MAX_ATTEMPTS),
+            )
+            db.execute(
+                "UPDATE jobs SET status = 'queued', worker_pid = NULL, done = 0, message = 'Restarted after worker loss' "
+                "WHERE status = 'running' AND heartbeat < ?",
+                (now - STALE_SECONDS,),
+            )
+            row = db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET status = 'running', worker_pid = ?, started = ?, heartbeat = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker_pid, now, now, row["id"]),
+                )
+                row = db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    return job_from_row(row) if row else None
+
+
+def finish_job(job_id, status, result=None, error=None, message=None):
+    with closing(connect()) as db:
+        db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, message = COALESCE(?, message), finished = ?, "
+            "done = CASE WHEN ? = 'done' THEN COALESCE(total, done) ELSE done END, eta = NULL WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, message, time.time(), status, job_id),
+        )
+
+
+class JobProgress:
+    """Handed to job handlers to report progress; also where cancellation is noticed.
+
+    update() computes the rate and ETA, writes at most every
+    PROGRESS_WRITE_SECONDS and raises JobCancelled once a cancel was requested.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = time.time()
+        self._last_write = 0.0
+
+    def update(self, done, total=None, unit=None, message=None, force=False):
+        now = time.time()
+        if not force and now - self._last_write < PROGRESS_WRITE_SECONDS:
+            return
+        self._last_write = now
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed > 0 and done else None
+        eta = (total - done) / rate if rate and total else None
+        with closing(connect()) as db:
+            db.execute(
+                "UPDATE jobs SET done = ?, total = COALESCE(?, total), unit = COALESCE(?, unit), rate = ?, eta = ?, "
+                "message = COALESCE(?, message), heartbeat = ? WHERE id = ?",
+                (done, total, unit, rate, eta, message, now, self.job_id),
+            )
+            cancelled = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (self.job_id,)).fetchone()[0]
+        if cancelled:
+            raise JobCancelled()
+
+
+# ---------------- JOB HANDLERS ---------------- #
+# The headless engine is imported inside each handler, so the app's UI never loads it
+
+def core_share(requested=None):
+    """Processes one job may use: its share of the machine's cores across the pool, or fewer if asked."""
+    share = max(1, (os.cpu_count() or 1) // max(1, POOL_SIZE))
+    return min(requested, share) if requested else share
+
+
+def run_render_subtitles(params, progress):
+    from engine import render_subtitles
+
+    return render_subtitles(
+        params["video_path"], params["subtitles_path"], params["output_path"], params["template"],
+        workers=core_share(params.get("workers")), chunk_seconds=params["chunk_seconds"],
+        report_path=params.get("report_path"), on_progress=lambda done, total: progress.update(done, total, "frames"),
+        cores=core_share(),
+    )
+
+
+def run_transcribe(params, progress):
+    from engine import transcribe_audio, write_timestamps
+    from long_form_transcription import DEFAULT_WORKERS
+
+    progress.update(0, message="Transcribing", force=True)
+    timestamps = transcribe_audio(
+        params["audio_path"], audio_hash=params.get("audio_hash"),
+        long_form=params.get("long_form", False), workers=core_share(params.get("workers") or DEFAULT_WORKERS),
+        cores=core_share(),
+    )
+    write_timestamps(timestamps, params["output_path"])
+    return {"segments": len(timestamps["segments"])}
+
+
+def run_tts(params, progress):
+    from engine import synthesize_speech
+
+    progress.update(0, message="Synthesizing", force=True)
+    chunks = synthesize_speech(
+        params["text"], params["voice"], params["output_path"], words_path=params.get("words_path"),
+        long_text=params.get("long_text", False), concurrency=params["concurrency"],
+        on_progress=lambda done, total: progress.update(done, total, "chunks", force=done == total),
+    )
+    return {"chunks": chunks}
+
+
+def run_still_video(params, progress):
+    from engine import still_video
+
+    progress.update(0, message="Encoding", force=True)
+    still_video(
+        params["audio_path"], params["output_path"], params["width"], params["height"],
+        image_path=params.get("image_path"), color=params["color"],
+    )
+    return {}
+
+
+JOB_HANDLERS = {
+    "render_subtitles": run_render_subtitles,
+    "transcribe": run_transcribe,
+    "tts": run_tts,
+    "still_video": run_still_video,
+}
+
+
+def register_job(kind, handler):
+    """Makes a job kind available; handler(params, progress) returns a JSON-serializable result."""
+    JOB_HANDLERS[kind] = handler
+
+
+# ---------------- WORKERS ---------------- #
+
+def run_job(job):
+    progress = JobProgress(job["id"])
+    os.chdir(APP_DIR)  # Handlers resolve Templates/ and assets/ like the app does
+    try:
+        result = JOB_HANDLERS[job["kind"]](job["params"], progress)
+    except JobCancelled:
+        finish_job(job["id"], "cancelled", message="Cancelled")
+    except Exception as e:
+        stderr = getattr(e, "stderr", None)  # ffmpeg.Error keeps the useful part here
+        detail = stderr.decode("utf-8", "replace") if isinstance(stderr, bytes) else ""
+        finish_job(job["id"], "failed", error=f"{e}\n\n{detail}{traceback.format_exc()}")
+    else:
+        finish_job(job["id"], "done", result=result, message="Done")
+
+
+def exit_worker(code):
+    """Ends this worker together with everything it started (chunk pools, Managers, ffmpeg).
+
+    Pool workers lead their own process group (see ensure_workers), which
+    their children inherit; on Windows only the worker itself exits.
+    """
+    if hasattr(os, "killpg") and os.getpgid(0) == os.getpid():
+        os.killpg(os.getpid(), signal.SIGKILL)
+    os._exit(code)
+
+
+def heartbeat(current, parent_pid):
+    """Worker side thread: keeps the running job's heartbeat fresh and enforces cancellation.
+
+    A handler that does not stop within CANCEL_GRACE_SECONDS of a cancel
+    request (e.g. inside one long Whisper call) takes its worker, and the
+    processes it started, down with it; the pool starts a fresh one.
+    """
+    cancel_seen = None
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        if parent_pid and os.getppid() != parent_pid:
+            exit_worker(0)  # The app that started this worker is gone
+        job_id = current.get("id")
+        if job_id is None:
+            cancel_seen = None
+            continue
+        with closing(connect()) as db:
+            db.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+            requested = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        if not requested:
+            cancel_seen = None
+        elif cancel_seen is None:
+            cancel_seen = time.time()
+        elif time.time() - cancel_seen > CANCEL_GRACE_SECONDS and current.get("id") == job_id:
+            finish_job(job_id, "cancelled", message="Cancelled")
+            exit_worker(1)
+
+
+def worker_loop(parent_pid=None):
+    """Runs queued jobs one at a time until the parent process exits."""
+    current = {}
+    threading.Thread(target=heartbeat, args=(current, parent_pid), daemon=True).start()
+    while True:
+        job = claim_job(os.getpid())
+        if job is None:
+            time.sleep(POLL_SECONDS)
+            continue
+        current["id"] = job["id"]
+        try:
+            run_job(job)
+        finally:
+            current.pop("id", None)
+
+
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def ensure_workers(count=POOL_SIZE):
+    """Starts (or restarts) this process's pool of worker processes."""
+    with _workers_lock:
+        _workers[:] = [worker for worker in _workers if worker.poll() is None]
+        while len(_workers) < count:
+            _workers.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--worker", "--parent-pid", str(os.getpid())], cwd=APP_DIR,
+                env={**os.environ, "AVS_JOB_WORKERS": str(count)},  # Workers size their core share by the real pool
+                start_new_session=True,  # A process group of its own, so exit_worker can take its children with it
+            ))
+
+
+# ---------------- STREAMLIT HELPERS ---------------- #
+
+def browser_token():
+    """The raw token in Streamlit's XSRF cookie, which a browser keeps across refreshes, or None.
+
+    The cookie is re-masked whenever Streamlit re-sends it, so the token is
+    unmasked here (Tornado's "2|mask|masked token|timestamp" format).
+    """
+    import streamlit as st
+
+    cookie = st.context.cookies.get("_streamlit_xsrf")
+    if not cookie:
+        return None  # XSRF protection is off, or no browser (e.g. tests)
+    try:
+        version, mask, masked, _ = cookie.split("|")
+        mask, masked = bytes.fromhex(mask), bytes.fromhex(masked)
+    except ValueError:
+        return None
+    if version != "2" or not mask:
+        return None
+    return bytes(byte ^ mask[i % len(mask)] for i, byte in enumerate(masked))
+
+
+def session_owner():
+    """A token identifying this browser's jobs.
+
+    It is derived from the browser's Streamlit cookie, so a refreshed page
+    still owns its jobs, and never appears in the URL: a shared link carries
+    only the job id, which shows nothing to anyone else. Without the cookie
+    the token lasts for the session.
+    """
+    import streamlit as st
+
+    if "job_owner" not in st.session_state:
+        token = browser_token()
+        st.session_state["job_owner"] = (
+            hashlib.sha256(b"job-owner:" + token).hexdigest()[:32] if token else uuid.uuid4().hex
+        )
+    st.query_params.pop("owner", None)  # Links from before the token left the URL
+    return st.session_state["job_owner"]
+
+
+def remember_job(key, job_id):
+    """Attaches a tool to a job; the job id is kept in the URL too, so a refreshed page reattaches."""
+    import streamlit as st
+
+    st.session_state[key] = job_id
+    st.query_params[key] = job_id
+
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def show_progress(job):
+    import streamlit as st
+
+    if job["status"] == "queued":
+        st.info(f"⏳ Queued ({queue_position(job['id'])} job(s) ahead)")
+        return
+    total, unit = job["total"], job["unit"] or ""
+    if total:
+        text = f"{int(job['done'])}/{int(total)} {unit}"
+        if job["rate"]:
+            text += f" · {job['rate']:.1f} {unit}/s"
+        if job["eta"] is not None:
+            text += f" · ETA {format_seconds(job['eta'])}"
+        st.progress(min(1.0, job["done"] / total), text=text)
+    else:
+        st.progress(0.0, text=job["message"] or "Running...")
+
+
+def job_panel(key, kind):
+    """Shows the tool's current job with live progress and a cancel button.
+
+    Earlier jobs of the same kind submitted from this browser can be
+    reattached from a list. Returns the job once it is done, else None.
+    """
+    import streamlit as st
+
+    owner = session_owner()
+    recent = list_jobs(kind, owner=owner, limit=10)
+    if recent:
+        with st.expander("🗂 Recent Jobs"):
+            labels = {
+                job["id"]: f"{time.strftime('%H:%M:%S', time.localtime(job['created']))} · {job['status']} · {job['id'][:8]}"
+                for job in recent
+            }
+            picked = st.selectbox("Reattach to a job", list(labels), format_func=labels.get, index=None, key=f"{key}_recent")
+            if picked and st.button("Reattach", key=f"{key}_reattach"):
+                remember_job(key, picked)
+
+    job_id = st.session_state.get(key) or st.query_params.get(key)
+    job = get_owned_job(job_id, owner)
+    if job is None:
+        return None  # Someone else's job id (e.g. a shared URL) shows nothing
+
+    if job["status"] in ACTIVE_STATUSES:
+        if POOL_SIZE:
+            ensure_workers()  # A restarted app picks its queue back up
+
+        @st.fragment(run_every=1.0)
+        def live_status():
+            current = get_job(job_id)
+            if current["status"] not in ACTIVE_STATUSES:
+                st.rerun()  # Finished: redraw the whole tool with the result
+            show_progress(current)
+            if st.button("✖ Cancel Job", key=f"{key}_cancel", disabled=bool(current["cancel_requested"])):
+                cancel_job(job_id)
+
+        live_status()
+        return None
+    if job["status"] == "failed":
+        st.error(f"Job failed: {(job['error'] or 'unknown error').splitlines()[0]}")
+        with st.expander("Details"):
+            st.code(job["error"] or "")
+        return None
+    if job["status"] == "cancelled":
+        st.warning("Job cancelled.")
+        return None
+    return job
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=POOL_SIZE, help="Worker processes to run in the foreground")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--parent-pid", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker_loop(args.parent_pid)
+        return 0
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    ensure_workers(args.workers)
+    try:
+        while True:
+            time.sleep(5)
+            ensure_workers(args.workers)
+    except KeyboardInterrupt:
+        for worker in _workers:
+            worker.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
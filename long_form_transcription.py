@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ffmpeg_io import probe_duration, detect_silences, extract_audio_clip
+from transcription_service import get_transcription_service, iter_vosk_words, DEFAULT_MODEL
+
+TARGET_CHUNK_SECONDS = 90
+MIN_CHUNK_SECONDS = 30
+MAX_CHUNK_SECONDS = 150
+OVERLAP_SECONDS = 2.0  # Only used for hard cuts, where no silence was found
+SEGMENT_GAP_SECONDS = 0.8  # Vosk has no segments; a pause this long starts a new one
+SEGMENT_MAX_WORDS = 20
+DEFAULT_WORKERS = 4  # Each worker process holds its own copy of the model
+
+
+def plan_audio_chunks(duration, silences, target_seconds=TARGET_CHUNK_SECONDS,
+                      min_seconds=MIN_CHUNK_SECONDS, max_seconds=MAX_CHUNK_SECONDS):
+    """Splits the audio into chunks that end in silence where possible.
+
+    Each chunk is a dict with the range to transcribe (start, end) and the
+    range whose words it owns (keep_from, keep_until). Cuts are made in the
+    middle of the silence closest to target_seconds; when a stretch has no
+    silence the chunk is cut at max_seconds and both sides overlap the cut by
+    OVERLAP_SECONDS, so words straddling it are heard whole by one of them.
+    """
+    midpoints = [(start + (end if end is not None else duration)) / 2 for start, end in silences]
+    cuts, position = [], 0.0
+    while duration - position > max_seconds:
+        candidates = [t for t in midpoints if position + min_seconds <= t <= position + max_seconds]
+        if candidates:
+            cut = min(candidates, key=lambda t: abs(t - position - target_seconds))
+            cuts.append((cut, False))
+        else:
+            cut = position + max_seconds
+            cuts.append((cut, True))
+        position = cut
+
+    bounds = [(0.0, False)] + cuts + [(duration, False)]
+    chunks = []
+    for (begin, begin_hard), (finish, finish_hard) in zip(bounds, bounds[1:]):
+        chunks.append({
+            "start": max(0.0, begin - OVERLAP_SECONDS) if begin_hard else begin,
+            "end": min(duration, finish + OVERLAP_SECONDS) if finish_hard else finish,
+            "keep_from": begin,
+            "keep_until": finish,
+        })
+    return chunks
+
+
+def vosk_segments(words):
+    """Groups Vosk words (word, start, end, conf) into Whisper-style segments."""
+    segments, current = [], []
+    for word in words:
+        entry = {"word": " " + word["word"], "start": word["start"], "end": word["end"],
+                 "probability": word.get("conf", 1.0)}
+        if current and (entry["start"] - current[-1]["end"] > SEGMENT_GAP_SECONDS or len(current) >= SEGMENT_MAX_WORDS):
+            segments.append({"start": current[0]["start"], "end": current[-1]["end"], "words": current})
+            current = []
+        current.append(entry)
+    if current:
+        segments.append({"start": current[0]["start"], "end": current[-1]["end"], "words": current})
+    return segments
+
+
+def limit_worker_threads(threads):
+    """Process-pool initializer: caps torch's intra-op threads so the workers share the cores instead of each taking them all."""
+    try:
+        import torch
+    except ImportError:  # Vosk and stub workers never load torch
+        return
+    torch.set_num_threads(threads)
+
+
+def transcribe_chunk(audio_path, chunk, engine, model_name, model_path, options):
+    """Process-pool worker: transcribes one chunk and returns its segments in file time.
+
+    Each worker process keeps its own resident model, so the model is loaded
+    once per worker rather than once per chunk.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        clip_path = os.path.join(work_dir, "chunk.wav")
+        extract_audio_clip(audio_path, clip_path, chunk["start"], chunk["end"] - chunk["start"])
+
+        if engine == "vosk":
+            segments, language = vosk_segments(iter_vosk_words(clip_path, model_path)), None
+        else:
+            result = get_transcription_service(engine, model_name).transcribe(clip_path, **options)
+            segments, language = result.get("segments", []), result.get("language")
+
+    offset = chunk["start"]
+    stitched = []
+    for segment in segments:
+        words = []
+        for word in segment.get("words", []):
+            start, end = word["start"] + offset, word["end"] + offset
+            # Keep only the words this chunk owns, judged by their midpoint
+            if chunk["keep_from"] <= (start + end) / 2 < chunk["keep_until"]:
+                words.append({**word, "start": round(start, 3), "end": round(end, 3)})
+        if words:
+            stitched.append({**segment, "start": words[0]["start"], "end": words[-1]["end"], "words": words})
+    return {"segments": stitched, "language": language}
+
+
+def normalize_word(text):
+    return re.sub(r"[^\w']", "", text.lower())
+
+
+def dedupe_edge_words(segments):
+    """Drops a word repeated across a chunk edge: same text, overlapping the previous word in time."""
+    previous = None
+    for segment in segments:
+        kept = []
+        for word in segment["words"]:
+            if previous and word["start"] < previous["end"] and normalize_word(word["word"]) == normalize_word(previous["word"]):
+                continue
+            kept.append(word)
+            previous = word
+        segment["words"] = kept
+    return [segment for segment in segments if segment["words"]]
+
+
+def transcribe_long_audio(audio_path, engine=None, model_name=DEFAULT_MODEL, model_path=None, workers=None,
+                          target_seconds=TARGET_CHUNK_SECONDS, cores=None, **options):
+    """Transcribes long audio by splitting it on silence and transcribing chunks in parallel.
+
+    engine is a transcription_service backend name ("whisper", "stub", ...)
+    or "vosk" (with model_path). Returns the audio.json schema (text,
+    segments with words, language) with timestamps in file time, ready for
+    the subtitle animation tool, plus a "long_form" entry with chunk and
+    timing details. cores is the job's CPU budget, shared by the workers'
+    torch threads (default: the whole machine).
+    """
+    started = time.perf_counter()
+    engine = engine or os.environ.get("AVS_TRANSCRIBE_BACKEND", "whisper")
+    workers = workers or max(1, min(DEFAULT_WORKERS, cores or os.cpu_count() or 1))
+
+    duration = probe_duration(audio_path)
+    chunks = plan_audio_chunks(duration, detect_silences(audio_path), target_seconds)
+
+    if workers == 1 or len(chunks) == 1:
+        results = [transcribe_chunk(audio_path, chunk, engine, model_name, model_path, options) for chunk in chunks]
+    else:
+        pool_size = min(workers, len(chunks))
+        threads = max(1, (cores or os.cpu_count() or 1) // pool_size)
+        with ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=limit_worker_threads, initargs=(threads,)) as pool:
+            futures = [
+                pool.submit(transcribe_chunk, audio_path, chunk, engine, model_name, model_path, options)
+                for chunk in chunks
+            ]
+            results = [future.result() for future in futures]
+
+    segments = dedupe_edge_words([segment for result in results for segment in result["segments"]])
+    for i, segment in enumerate(segments):
+        segment["id"] = i
+        segment["seek"] = 0
+        # Edge words may have been dropped, so rebuild the span and text from what is left
+        segment["start"], segment["end"] = segment["words"][0]["start"], segment["words"][-1]["end"]
+        segment["text"] = "".join(word["word"] for word in segment["words"])
+
+    language = next((result["language"] for result in results if result["language"]), "en")
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language,
+        "long_form": {
+            "engine": engine,
+            "duration": round(duration, 3),
+            "chunks": [[round(chunk["start"], 3), round(chunk["end"], 3)] for chunk in chunks],
+            "workers": workers,
+            "wall_seconds": round(time.perf_counter() - started, 3),
+        },
+    }
@@ -1,48 +1,26 @@
 import os
-import tempfile
 import streamlit as st
-from moviepy.editor import AudioFileClip, ColorClip, CompositeVideoClip
-from pydub import AudioSegment
-from vosk import Model, KaldiRecognizer
-import wave
-import json
-
-# Set the path to the ImageMagick binary
-os.environ["IMAGEMAGICK_BINARY"] = r"C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe"
-
-def transcribe_audio_to_word_timings(input_mp3):
-    """Convert MP3 to WAV and transcribe it using the Vosk model."""
-    # Convert MP3 to WAV (Vosk requires WAV format)
-    audio = AudioSegment.from_mp3(input_mp3)
-    audio.export("temp.wav", format="wav")
-
-    # Load Vosk model
-    model_path = "models/vosk-model-small-en-us-0.15"  # Path to the Vosk model
-    model = Model(model_path)
-
-    # Open the WAV file
-    wf = wave.open("temp.wav", "rb")
-    recognizer = KaldiRecognizer(model, wf.getframerate())
-    recognizer.SetWords(True)  # Enable word-level timings
-
-    word_timings = []
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        if recognizer.AcceptWaveform(data):
-            result = json.loads(recognizer.Result())
-            if "result" in result:
-                for word in result["result"]:
-                    word_timings.append((word["word"], word["start"], word["end"]))
-
-    # Get the final result
-    final_result = json.loads(recognizer.FinalResult())
-    if "result" in final_result:
-        for word in final_result["result"]:
-            word_timings.append((word["word"], word["start"], word["end"]))
-
-    return word_timings
+from workspaces import create_workspace, open_workspace, offer_download, preview_video
+from job_queue import submit_job, remember_job, job_panel, session_owner
+from transcription_service import iter_vosk_words
+from transcription_cache import cached_transcription, hash_file
+
+VOSK_MODEL_PATH = "models/vosk-model-small-en-us-0.15"  # Path to the Vosk model
+
+def transcribe_audio_to_word_timings(input_mp3, model_path=VOSK_MODEL_PATH):
+    """Transcribe an MP3 with Vosk; results are cached by the audio's content hash."""
+    word_timings = cached_transcription(
+        hash_file(input_mp3),
+        "vosk",
+        os.path.basename(model_path),
+        {"words": True},
+        lambda: run_vosk_transcription(input_mp3, model_path),
+    )
+    return [tuple(timing) for timing in word_timings]
+
+def run_vosk_transcription(input_mp3, model_path):
+    """Stream the MP3 through the shared Vosk model and collect (word, start, end) timings."""
+    return [(word["word"], word["start"], word["end"]) for word in iter_vosk_words(input_mp3, model_path)]
 
 def mp3_to_mp4_tool():
     st.write("Convert MP3 files to MP4 videos.")
@@ -53,55 +31,52 @@ def mp3_to_mp4_tool():
     # Aspect ratio selection
     aspect_ratio = st.selectbox("Select Aspect Ratio:", ["16:9", "4:3", "1:1"], index=0)
 
+    # Static background: a solid color or an image, encoded once and looped by ffmpeg
+    background_color = st.color_picker("Background Color:", "#00FF00")
+    background_image = st.file_uploader("Or upload a background image:", type=["png", "jpg", "jpeg"])
+
     # Generate video
     if st.button("Generate Video"):
         if mp3_file:
-            # Save the uploaded MP3 file to a temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                tmp_file.write(mp3_file.getbuffer())
-                mp3_path = tmp_file.name
-
-            try:
-                # Load the MP3 file
-                audio_clip = AudioFileClip(mp3_path)
-
-                # Create a blank video with the selected aspect ratio
-                if aspect_ratio == "16:9":
-                    width, height = 1920, 1080
-                elif aspect_ratio == "4:3":
-                    width, height = 1440, 1080
-                else:
-                    width, height = 1080, 1080
-
-                # Create a green background using ColorClip
-                background = ColorClip(size=(width, height), color=(0, 255, 0), duration=audio_clip.duration)
-
-                # Combine background and audio
-                final_clip = CompositeVideoClip([background]).set_audio(audio_clip)
-
-                # Save the video
-                output_file = "generated_video.mp4"
-                final_clip.write_videofile(output_file, fps=24)
-
-                st.success("Video generated successfully!")
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
-            finally:
-                # Close the audio clip to release the file handle
-                audio_clip.close()
-                # Clean up the temporary file
-                os.unlink(mp3_path)
+            # Each job gets its own workspace; uploads are streamed to it
+            workspace = create_workspace()
+            mp3_path = workspace.save_upload(mp3_file, "audio.mp3")
+            image_path = None
+            if background_image:
+                image_path = workspace.save_upload(background_image, "background" + os.path.splitext(background_image.name)[1])
+
+            # Video size for the selected aspect ratio
+            if aspect_ratio == "16:9":
+                width, height = 1920, 1080
+            elif aspect_ratio == "4:3":
+                width, height = 1440, 1080
+            else:
+                width, height = 1080, 1080
+
+            # Encode in a background worker
+            job_id = submit_job("still_video", {
+                "workspace": workspace.id,
+                "audio_path": mp3_path,
+                "output_path": workspace.file("generated_video.mp4"),
+                "width": width,
+                "height": height,
+                "image_path": image_path,
+                "color": "0x" + background_color.lstrip("#"),
+            }, owner=session_owner())
+            remember_job("mp3_to_mp4_job", job_id)
         else:
             st.error("Please upload an MP3 file.")
 
-    # Preview and download
+    # Preview and download the session's latest video
+    job = job_panel("mp3_to_mp4_job", "still_video")
+    workspace = open_workspace(job["params"]["workspace"]) if job else None
+    if workspace:
+        st.success("Video generated successfully!")
     if st.button("Preview Video"):
-        if os.path.exists("generated_video.mp4"):
-            st.video("generated_video.mp4")
+        if workspace:
+            preview_video(workspace, "generated_video.mp4")
         else:
             st.error("No video file found. Please generate the video first.")
 
-    if os.path.exists("generated_video.mp4"):
-        with open("generated_video.mp4", "rb") as f:
-            video_bytes = f.read()
-        st.download_button("Download Video", video_bytes, file_name="generated_video.mp4", mime="video/mp4")
+    if workspace:
+        offer_download(workspace, "generated_video.mp4", "Download Video", "generated_video.mp4", "video/mp4")
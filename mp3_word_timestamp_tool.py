@@ -1,24 +1,9 @@
 import streamlit as st
-import subprocess
 import json
 import os
-import tempfile
-
-def transcribe_audio(mp3_path, output_dir):
-    """ Transcribes MP3 audio using Whisper and saves JSON output """
-    command = [
-        "whisper", mp3_path,
-        "--model", "small",
-        "--word_timestamps", "True",
-        "--output_format", "json",
-        "--output_dir", output_dir
-    ]
-    subprocess.run(command, check=True)
-    
-    json_filename = os.path.join(output_dir, os.path.splitext(os.path.basename(mp3_path))[0] + ".json")
-    
-    with open(json_filename, "r") as f:
-        return json.load(f), json_filename
+from transcription_cache import save_upload_hashed
+from workspaces import create_workspace, open_workspace, offer_download
+from job_queue import submit_job, remember_job, job_panel, session_owner
 
 def mp3_word_timestamp_tool():
     st.header("🎤 MP3 to Word & Sentence-Level Timestamps")
@@ -26,40 +11,43 @@ def mp3_word_timestamp_tool():
 
     uploaded_mp3 = st.file_uploader("Upload MP3 File", type=["mp3"])
 
+    long_form = st.checkbox("Long-form mode (split on silence, transcribe chunks in parallel)",
+                            help="Recommended for recordings longer than a few minutes.")
+    workers = st.number_input("Parallel workers", min_value=0, max_value=os.cpu_count() or 1, value=0,
+                              disabled=not long_form, help="0 = automatic: the job's share of the server's cores")
+
     if st.button("Generate Timestamps"):
         if uploaded_mp3:
-            st.success("Processing... This may take a few minutes.")
-
-            # Save uploaded MP3 to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
-                temp_file.write(uploaded_mp3.read())
-                mp3_path = temp_file.name
-
-            output_dir = tempfile.mkdtemp()
-            timestamps, json_filename = transcribe_audio(mp3_path, output_dir)
-
-            st.success("Timestamps Generated Successfully!")
-
-            # Show preview in collapsed mode
-            with st.expander("🔍 View Timestamps (First 5 Segments)"):
-                st.json(timestamps["segments"][:5])
-
-            # Format JSON properly before saving
-            formatted_json_path = os.path.join(output_dir, "generated_timestamps.json")
-            with open(formatted_json_path, "w", encoding="utf-8") as f:
-                json.dump(timestamps, f, indent=4, ensure_ascii=False)
+            # Stream the uploaded MP3 to the job's workspace, hashing it on the way
+            workspace = create_workspace()
+            mp3_path = workspace.file("audio.mp3")
+            audio_hash = save_upload_hashed(uploaded_mp3, mp3_path)
+
+            # Transcribe in a background worker; it may take a few minutes
+            job_id = submit_job("transcribe", {
+                "workspace": workspace.id,
+                "audio_path": mp3_path,
+                "audio_hash": audio_hash,
+                "output_path": workspace.file("generated_timestamps.json"),
+                "long_form": long_form,
+                "workers": int(workers),
+            }, owner=session_owner())
+            remember_job("timestamps_job", job_id)
+        else:
+            st.error("Please upload an MP3 file.")
 
-            # Provide download button for formatted JSON
-            with open(formatted_json_path, "rb") as file:
-                st.download_button("📥 Download JSON", file, "generated_timestamps.json", mime="application/json")
+    job = job_panel("timestamps_job", "transcribe")
+    workspace = open_workspace(job["params"]["workspace"]) if job else None
+    if workspace:
+        st.success("Timestamps Generated Successfully!")
 
-            # Cleanup
-            os.remove(mp3_path)
-            os.remove(json_filename)
-            os.remove(formatted_json_path)
+        # Show preview in collapsed mode
+        with st.expander("🔍 View Timestamps (First 5 Segments)"):
+            with open(workspace.file("generated_timestamps.json"), "r", encoding="utf-8") as f:
+                st.json(json.load(f)["segments"][:5])
 
-        else:
-            st.error("Please upload an MP3 file.")
+        offer_download(workspace, "generated_timestamps.json", "Download JSON", "generated_timestamps.json",
+                       "application/json")
 
 if __name__ == "__main__":
     mp3_word_timestamp_tool()
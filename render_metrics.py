@@ -0,0 +1,103 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+
+STAGES = ("decode", "layout", "draw", "composite", "encode")
+COUNTERS = ("frames_rendered", "frames_passed_through", "sprite_cache_hits", "sprite_cache_misses")
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+class RenderStats:
+    """Per-stage timings and counters for one render job.
+
+    Stages are timed as laps: each lap() charges the time since the previous
+    lap to a stage, so a frame costs one perf_counter call per stage.
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.wall_seconds = 0.0
+        self._last = time.perf_counter()
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.seconds[stage] += now - self._last
+        self._last = now
+
+    def count(self, counter, amount=1):
+        self.counts[counter] += amount
+
+    def merge(self, report):
+        """Adds the totals of another job's report, e.g. from a parallel worker."""
+        for stage, seconds in report["stage_seconds"].items():
+            self.seconds[stage] += seconds
+        for counter, value in report["counts"].items():
+            self.counts[counter] += value
+
+    def report(self, **extra):
+        frames = self.counts["frames_rendered"] + self.counts["frames_passed_through"]
+        return {
+            "frames": frames,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "fps": round(frames / self.wall_seconds, 3) if self.wall_seconds else None,
+            "stage_seconds": {stage: round(seconds, 6) for stage, seconds in self.seconds.items()},
+            "stage_ms_per_frame": {
+                stage: round(seconds * 1000 / frames, 4) if frames else None for stage, seconds in self.seconds.items()
+            },
+            "counts": dict(self.counts),
+            **extra,
+        }
+
+
+def write_report(report, path):
+    """Writes a job report as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+
+class RenderProfiler:
+    """Opt-in cProfile or tracemalloc sampling around a render job.
+
+    The mode comes from the argument or the AVS_RENDER_PROFILE environment
+    variable; with neither set it does nothing.
+    """
+
+    def __init__(self, mode=None, output_path=None):
+        self.mode = mode or os.environ.get("AVS_RENDER_PROFILE") or None
+        if self.mode is not None and self.mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {self.mode!r}, expected one of {PROFILE_MODES}")
+        self.output_path = output_path
+        self.summary = None
+        self._profile = None
+
+    def __enter__(self):
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == "tracemalloc":
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.mode == "cprofile":
+            self._profile.disable()
+            if self.output_path:
+                self._profile.dump_stats(self.output_path + ".prof")
+            self.summary = {"mode": "cprofile", "stats_file": self.output_path + ".prof" if self.output_path else None}
+        elif self.mode == "tracemalloc":
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.summary = {
+                "mode": "tracemalloc",
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top_allocations": [str(stat) for stat in snapshot.statistics("lineno")[:10]],
+            }
+        return False
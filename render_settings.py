@@ -0,0 +1,7 @@
+"""Render defaults the tools show before a job is queued.
+
+Only the standard library is used here, so the UI can read them without
+loading the renderer (OpenCV, numpy).
+"""
+
+DEFAULT_CHUNK_SECONDS = 10  # Target length of each parallel render chunk
@@ -0,0 +1,571 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import accumulate
+
+import numpy as np
+
+from asset_cache import SpriteCache, load_overlay_asset
+from compositing import blend_premultiplied, dilate_mask, fill_rect, shadow_mask
+from glyph_atlas import get_text_engine
+from render_metrics import RenderStats, RenderProfiler, write_report
+from render_settings import DEFAULT_CHUNK_SECONDS
+from template_registry import resolve_template
+from ffmpeg_io import (
+    probe_video,
+    probe_keyframe_times,
+    iter_video_frames,
+    open_video_encoder,
+    write_frame,
+    close_encoder,
+    concat_videos,
+)
+
+logger = logging.getLogger(__name__)
+
+# ---------------- HELPER FUNCTIONS ---------------- #
+
+BASE_LINE_HEIGHT = 35  # Pixel height of one subtitle row before line_spacing
+LINE_CACHE_SIZE = 8  # Line layers (word masks, outline and shadow) kept per job; lines are mostly visited in order
+# A layer holds float32 color and alpha (16 bytes per pixel), about 25 MB for a full-width line at 4K, so the
+# cache is also capped by bytes: each render process holds at most this much, plus the layer in use
+LINE_CACHE_BYTES = int(os.environ.get("AVS_LINE_CACHE_MB", "96")) * (1 << 20)
+PROGRESS_INTERVAL_FRAMES = 30  # Frames between on_progress calls (and cancellation checks)
+PROGRESS_POLL_SECONDS = 1.0  # Longest wait between on_progress calls while chunks render
+
+
+def apply_text_case(text, text_case):
+    """Applies the template's text case transformation."""
+    if text_case == "uppercase":
+        return text.upper()
+    if text_case == "lowercase":
+        return text.lower()
+    if text_case == "capitalize":
+        return text.title()
+    return text
+
+
+def build_interval_index(starts, ends):
+    """Sorts intervals by start time for O(log n) lookup of the one active at a time."""
+    order = sorted(range(len(starts)), key=lambda i: starts[i])
+    sorted_ends = [ends[i] for i in order]
+    return {
+        "order": order,
+        "starts": [starts[i] for i in order],
+        "ends": sorted_ends,
+        # Running max of end times lets gaps be rejected without scanning
+        "max_ends": list(accumulate(sorted_ends, max)),
+    }
+
+
+def find_interval(index, time_sec):
+    """Returns the position of the latest-starting interval covering time_sec, or None."""
+    i = bisect_right(index["starts"], time_sec) - 1
+    max_ends, ends = index["max_ends"], index["ends"]
+
+    # Walk back only through intervals that overlap this one
+    while i >= 0 and max_ends[i] >= time_sec:
+        if ends[i] >= time_sec:
+            return index["order"][i]
+        i -= 1
+    return None
+
+
+def load_emoji(style):
+    """Loads the template emoji once per job as a pre-scaled, premultiplied overlay."""
+    emoji_path = style.emoji_path
+    if not emoji_path:
+        return None
+
+    emoji = load_overlay_asset(emoji_path, style.emoji_scale, style.emoji_opacity)
+    if emoji is None:
+        logger.warning("Emoji image not found at %s", emoji_path)
+    return emoji
+
+
+def break_segment_into_lines(words, max_line_chars, multi_line):
+    """Groups a segment's words into display lines, keeping each word's transcript index."""
+    lines = []
+    current_line = []
+
+    for word_index, word in enumerate(words):
+        current_line.append(word_index)
+        text_preview = " ".join(words[i]["word"] for i in current_line)
+
+        if (multi_line and len(text_preview) > max_line_chars) or (not multi_line and len(text_preview) >= max_line_chars):
+            lines.append(current_line)
+            current_line = []
+
+    if current_line:
+        lines.append(current_line)
+
+    return lines
+
+
+def emoji_position(style, box, text_height, emoji_shape, width, height):
+    """Places the emoji relative to the subtitle box, clamped to the frame."""
+    emoji_height, emoji_width = emoji_shape[:2]
+    box_x_start, box_y_start, box_width = box["x"], box["y"], box["width"]
+    padding_x, padding_y = style.padding_x, style.padding_y
+    margin_x, margin_y = style.emoji_margin_x, style.emoji_margin_y
+    position = style.emoji_position
+
+    if position.endswith("left"):
+        emoji_x = box_x_start + padding_x + margin_x
+    elif position.endswith("center"):
+        emoji_x = box_x_start + (box_width - emoji_width) // 2
+    else:  # Default to right if position is invalid
+        emoji_x = box_x_start + box_width - padding_x - emoji_width - margin_x
+
+    if position.startswith("bottom"):
+        emoji_y = box_y_start + text_height + padding_y + margin_y
+    else:
+        emoji_y = box_y_start - emoji_height - margin_y
+
+    # Ensure emoji stays within frame bounds
+    emoji_x = max(0, min(emoji_x, width - emoji_width))  # Clamp X position
+    emoji_y = max(0, min(emoji_y, height - emoji_height))  # Clamp Y position
+    return emoji_x, emoji_y
+
+
+def emoji_sprite(style, box, text_height, emoji, width, height):
+    """Pins the job's emoji to a segment's box, or None if the template has no emoji."""
+    if emoji is None:
+        return None
+
+    emoji_x, emoji_y = emoji_position(style, box, text_height, emoji.shape, width, height)
+    return {"x": emoji_x, "y": emoji_y, "pixels": emoji}
+
+
+def compile_segment(segment_index, segment, style, text, emoji, width, height):
+    """Computes line breaks, word positions and box geometry for one segment."""
+    words = segment.get("words") or []
+    letter_spacing, text_case = style.letter_spacing, style.text_case
+    multi_line = style.multi_line
+    row_height = int(BASE_LINE_HEIGHT * style.line_spacing)
+
+    line_groups = break_segment_into_lines(words, style.max_line_chars, multi_line)
+    if not line_groups:
+        return None
+
+    # Box geometry is shared by every line of the segment
+    num_lines = len(line_groups) if multi_line else 1
+    text_height = int(BASE_LINE_HEIGHT * style.line_spacing * num_lines)
+    max_text_width = max(
+        text.text_size(" ".join(words[i]["word"] for i in group))[0][0]
+        for group in line_groups
+    )
+    box_width = min(width - 100, max_text_width + 2 * style.padding_x)
+    box = {
+        "x": (width - box_width) // 2,
+        "y": style.box_vertical_position,
+        "width": box_width,
+        "height": text_height + 2 * style.padding_y,
+    }
+    first_row_y = box["y"] + style.padding_y + int(BASE_LINE_HEIGHT * style.line_spacing / 2)
+
+    lines = []
+    for line_idx, group in enumerate(line_groups):
+        # Each transcript word may split into several drawn tokens
+        tokens = [(i, token) for i in group for token in words[i]["word"].split()]
+
+        total_text_width = sum(
+            text.text_size(token + " ")[0][0] + letter_spacing for _, token in tokens
+        ) - letter_spacing
+
+        if style.text_alignment == "left":
+            x = box["x"] + style.padding_x
+        elif style.text_alignment == "right":
+            x = box["x"] + box_width - style.padding_x - total_text_width
+        else:  # Center
+            x = box["x"] + (box_width - total_text_width) // 2
+        y = first_row_y + (line_idx * row_height if multi_line else 0)
+
+        placed_words = []
+        for word_index, token in tokens:
+            word_text = apply_text_case(token + " ", text_case)
+            placed_words.append({"text": word_text, "x": x, "y": y, "index": word_index})
+            x += text.text_size(word_text)[0][0] + letter_spacing  # Move forward
+
+        lines.append({
+            "start": words[group[0]]["start"],
+            "end": words[group[-1]]["end"],
+            "words": placed_words,
+            "word_ids": group,
+            "word_index": build_interval_index([words[i]["start"] for i in group], [words[i]["end"] for i in group]),
+        })
+
+    return {
+        "index": segment_index,
+        "start": segment["start"],
+        "end": segment["end"],
+        "lines": lines,
+        "line_index": build_interval_index([line["start"] for line in lines], [line["end"] for line in lines]),
+        "box": box,
+        "emoji": emoji_sprite(style, box, text_height, emoji, width, height),
+    }
+
+
+def compile_subtitle_plan(subtitle_data, template, width, height):
+    """Builds the subtitle plan once per (transcript, template, frame size).
+
+    template is anything resolve_template accepts: a CompiledTemplate, a raw
+    dict, a template name or path, or None for the default style.
+    """
+    style = resolve_template(template)
+    text = get_text_engine(style.font_family, style.font_scale, style.thickness, style.bold, style.italic)
+    emoji = load_emoji(style)
+
+    segments = []
+    for segment_index, segment in enumerate(subtitle_data.get("segments", [])):
+        segment_plan = compile_segment(segment_index, segment, style, text, emoji, width, height)
+        if segment_plan is not None:
+            segments.append(segment_plan)
+
+    # Lines are mostly visited in order, so one line's states (each word highlighted, plus none) is all
+    # the sprite cache needs; more would only pin megabytes of pixels per process
+    longest_line = max((len(line["word_ids"]) for s in segments for line in s["lines"]), default=0)
+
+    return {
+        "style": style,
+        "text": text,
+        "segments": segments,
+        "segment_index": build_interval_index([s["start"] for s in segments], [s["end"] for s in segments]),
+        "width": width,
+        "height": height,
+        "sprites": SpriteCache(longest_line + 1),
+        "lines": SpriteCache(LINE_CACHE_SIZE, LINE_CACHE_BYTES),
+    }
+
+
+def find_active_state(plan, time_sec):
+    """Resolves the active (segment, line, word) at time_sec, or None between subtitles."""
+    segment_pos = find_interval(plan["segment_index"], time_sec)
+    if segment_pos is None:
+        return None
+    segment_plan = plan["segments"][segment_pos]
+
+    line_pos = find_interval(segment_plan["line_index"], time_sec)
+    if line_pos is None:
+        return None
+    line = segment_plan["lines"][line_pos]
+
+    word_pos = find_interval(line["word_index"], time_sec)
+    active_word = line["word_ids"][word_pos] if word_pos is not None else None
+    return segment_plan, line_pos, active_word
+
+
+# ---------------- FRAME RENDERING ---------------- #
+
+def render_line_layer(plan, segment_plan, line_pos):
+    """Rasterizes one line state's words, outline and shadow; shared by every highlighted word on it.
+
+    The outline is the text's alpha mask dilated by the engine's outline
+    width, and the shadow is that mask shifted and Gaussian-blurred, so
+    effects cost one pass per line rather than one per frame.
+    """
+    style, text = plan["style"], plan["text"]
+    active_line = segment_plan["lines"][line_pos]
+    placed = [
+        (word, line is active_line)
+        for line in (segment_plan["lines"] if style.multi_line else [active_line])
+        for word in line["words"]
+    ]
+    shadow = style.shadow_opacity > 0
+    dx, dy = style.shadow_offset_x, style.shadow_offset_y
+    pad = style.shadow_blur + max(abs(dx), abs(dy)) if shadow else 0
+
+    # Bounding box of every word with its outline and shadow, clipped to the frame
+    boxes = []
+    for word, _ in placed:
+        left, top, right, bottom = text.ink_box(word["text"])
+        boxes.append((word["x"] + left, word["y"] + top, word["x"] + right, word["y"] + bottom))
+    x0 = max(0, min(box[0] for box in boxes) - pad)
+    y0 = max(0, min(box[1] for box in boxes) - pad)
+    x1 = min(plan["width"], max(box[2] for box in boxes) + pad)
+    y1 = min(plan["height"], max(box[3] for box in boxes) + pad)
+    if x1 <= x0 or y1 <= y0:
+        return None
+
+    # Each word's fill mask is kept cropped to its own box for recoloring per highlighted word
+    shape = (y1 - y0, x1 - x0)
+    ink = np.zeros(shape, np.uint8)
+    words = []
+    for (word, in_active_line), (bx0, by0, bx1, by1) in zip(placed, boxes):
+        bx0, by0 = max(bx0, x0) - x0, max(by0, y0) - y0
+        bx1, by1 = min(bx1, x1) - x0, min(by1, y1) - y0
+        if bx1 <= bx0 or by1 <= by0:
+            continue
+        mask = np.zeros((by1 - by0, bx1 - bx0), np.uint8)
+        text.draw(mask, word["text"], (word["x"] - x0 - bx0, word["y"] - y0 - by0))
+        np.maximum(ink[by0:by1, bx0:bx1], mask, out=ink[by0:by1, bx0:bx1])
+        words.append((word["index"] if in_active_line else None, (slice(by0, by1), slice(bx0, bx1)), mask))
+
+    # Shadow, then outline, premultiplied
+    outline = dilate_mask(ink, text.outline)
+    alpha = np.zeros((*shape, 1), np.float32)
+    color = np.zeros((*shape, 3), np.float32)
+    layers = [(shadow_mask(outline, dx, dy, style.shadow_blur, style.shadow_opacity), style.shadow_color)] if shadow else []
+    if text.outline > 0:
+        layers.append((outline, style.stroke_color))
+    for mask, layer_color in layers:
+        layer_alpha = mask.astype(np.float32)[..., None] / 255.0
+        color = color * (1.0 - layer_alpha) + layer_alpha * np.float32(layer_color)
+        alpha = alpha * (1.0 - layer_alpha) + layer_alpha
+
+    return {"x": x0, "y": y0, "color": color, "alpha": alpha, "words": words}
+
+
+def render_text_sprite(plan, segment_plan, line_pos, active_word):
+    """Renders one overlay state into a cropped, premultiplied BGRA sprite."""
+    style = plan["style"]
+    layer = plan["lines"].get(
+        (segment_plan["index"], line_pos), lambda: render_line_layer(plan, segment_plan, line_pos),
+    )
+    if layer is None:
+        return None
+
+    fill_masks = {}
+    for word_index, region, mask in layer["words"]:
+        highlighted = word_index is not None and word_index == active_word
+        fill_mask = fill_masks.setdefault(
+            style.highlight_color if highlighted else style.font_color, np.zeros(layer["alpha"].shape[:2], np.uint8),
+        )
+        np.maximum(fill_mask[region], mask, out=fill_mask[region])
+
+    # Composite fill over the line's shadow and outline in premultiplied space
+    color, alpha = layer["color"], layer["alpha"]
+    for fill_color, fill_mask in fill_masks.items():
+        fill_alpha = fill_mask.astype(np.float32)[..., None] / 255.0
+        color = color * (1.0 - fill_alpha) + fill_alpha * np.float32(fill_color)
+        alpha = alpha * (1.0 - fill_alpha) + fill_alpha
+
+    pixels = np.concatenate([color, alpha * 255.0], axis=2)
+    return {"x": layer["x"], "y": layer["y"], "pixels": np.round(pixels).astype(np.uint8)}
+
+
+def blend_sprite(img, sprite):
+    """Alpha-composites a premultiplied sprite onto its region of the frame in place."""
+    blend_premultiplied(img, sprite["x"], sprite["y"], sprite["pixels"])
+
+
+def apply_subtitle_style(frame, plan, time_sec, stats=None):
+    """Draws the subtitle active at time_sec onto a video frame.
+
+    When stats is given, the work is charged to its layout, draw and
+    composite stages.
+    """
+    state = find_active_state(plan, time_sec)
+    if state is None:
+        if stats is not None:
+            stats.lap("layout")
+            stats.count("frames_passed_through")
+        return frame
+
+    segment_plan, line_pos, active_word = state
+    style = plan["style"]
+    if stats is not None:
+        stats.lap("layout")
+
+    sprite = plan["sprites"].get(
+        (segment_plan["index"], line_pos, active_word),
+        lambda: render_text_sprite(plan, segment_plan, line_pos, active_word),
+    )
+    if stats is not None:
+        stats.lap("draw")
+
+    img = frame if frame.flags.writeable else frame.copy()
+
+    # Draw background box over its own region only
+    if style.show_box:
+        box = segment_plan["box"]
+        fill_rect(img, box["x"], box["y"], box["width"] + 1, box["height"] + 1, style.bg_color, style.bg_opacity)
+
+    if sprite is not None:
+        blend_sprite(img, sprite)
+
+    # Add emoji at a fixed position relative to the box
+    if segment_plan["emoji"] is not None:
+        blend_sprite(img, segment_plan["emoji"])
+
+    if stats is not None:
+        stats.lap("composite")
+        stats.count("frames_rendered")
+    return img
+
+
+# ---------------- VIDEO RENDERING ---------------- #
+
+def render_frames(video_path, info, plan, encoder, start_frame=0, frame_count=None, on_progress=None):
+    """Decodes, draws and encodes a run of frames; returns the run's report.
+
+    on_progress(frames_written) is called every PROGRESS_INTERVAL_FRAMES
+    frames; if it raises (e.g. to cancel), the encode is aborted.
+    """
+    fps = info["fps"]
+    # Seek half a frame early so rounding can never drop the chunk's first frame
+    start = (start_frame - 0.5) / fps if start_frame else None
+    debug = logger.isEnabledFor(logging.DEBUG)
+    stats = RenderStats()
+    written = 0
+    try:
+        stats.start()
+        for frame in iter_video_frames(video_path, info["width"], info["height"], start=start, frame_count=frame_count):
+            stats.lap("decode")
+            time_sec = (start_frame + written) / fps
+            if debug:
+                logger.debug("Frame %d at %.3fs: %s", start_frame + written, time_sec, find_active_state(plan, time_sec))
+            write_frame(encoder, apply_subtitle_style(frame, plan, time_sec, stats))
+            stats.lap("encode")
+            written += 1
+            if on_progress and written % PROGRESS_INTERVAL_FRAMES == 0:
+                on_progress(written)
+    except BaseException:
+        encoder.kill()
+        encoder.wait()
+        raise
+
+    close_encoder(encoder)
+    stats.lap("encode")
+    stats.count("sprite_cache_hits", plan["sprites"].hits)
+    stats.count("sprite_cache_misses", plan["sprites"].misses)
+    return stats.report()
+
+
+class RenderCancelled(Exception):
+    pass
+
+
+def render_chunk(video_path, info, subtitle_data, template, part_path, start_frame, frame_count, threads, cancel_event=None):
+    """Process-pool worker: renders one keyframe-aligned range into a video-only part.
+
+    Stops early with RenderCancelled once cancel_event is set.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise RenderCancelled()
+
+    def check_cancelled(frames_written):
+        if cancel_event.is_set():
+            raise RenderCancelled()
+
+    plan = compile_subtitle_plan(subtitle_data, template, info["width"], info["height"])
+    encoder = open_video_encoder(part_path, info["width"], info["height"], info["rate"], threads=threads)
+    return render_frames(
+        video_path, info, plan, encoder, start_frame, frame_count,
+        on_progress=check_cancelled if cancel_event is not None else None,
+    )
+
+
+def plan_chunks(keyframe_times, info, chunk_seconds):
+    """Splits the video into (start_frame, frame_count) ranges starting on keyframes.
+
+    The last range has no frame count and runs to the end of the video.
+    """
+    fps = info["fps"]
+    total_frames = round(info["duration"] * fps)
+    starts = [0]
+    for keyframe_time in keyframe_times:
+        frame = round((keyframe_time - info["start_time"]) * fps)
+        # A keyframe at or past the last frame would only start an empty chunk
+        if frame - starts[-1] >= chunk_seconds * fps and frame < total_frames:
+            starts.append(frame)
+
+    return [
+        (start, starts[i + 1] - start if i + 1 < len(starts) else None)
+        for i, start in enumerate(starts)
+    ]
+
+
+def render_subtitle_video(
+    video_path,
+    subtitle_data,
+    template,
+    output_path,
+    workers=1,
+    chunk_seconds=DEFAULT_CHUNK_SECONDS,
+    report_path=None,
+    profile=None,
+    on_progress=None,
+    cores=None,
+):
+    """Renders subtitles over a video in a single encode, stream-copying its audio.
+
+    With workers > 1 the video is split on keyframes into chunks of about
+    chunk_seconds, rendered in a process pool and joined without re-encoding.
+    Returns the job report (stage timings and frame/cache counts), which is
+    also written as JSON to report_path when given. profile ("cprofile" or
+    "tracemalloc") opts in to sampling the job. on_progress(frames_done,
+    total_frames) is called as frames (or, with workers, whole chunks)
+    finish, and at least every PROGRESS_POLL_SECONDS with workers; raising
+    from it cancels the render. cores is the job's CPU budget, shared by the
+    workers' encoders (default: the whole machine).
+    """
+    started = time.perf_counter()
+    template = resolve_template(template)  # An invalid template fails before any decoding starts
+    stats = RenderStats()
+    with RenderProfiler(profile, report_path) as profiler:
+        info = probe_video(video_path)
+        audio_source = video_path if info["has_audio"] else None
+        chunks = plan_chunks(probe_keyframe_times(video_path), info, chunk_seconds) if workers > 1 else [(0, None)]
+        total_frames = round(info["duration"] * info["fps"])
+
+        if len(chunks) == 1:
+            # Compile the subtitle layout once for the whole job
+            plan = compile_subtitle_plan(subtitle_data, template, info["width"], info["height"])
+            encoder = open_video_encoder(
+                output_path, info["width"], info["height"], info["rate"], audio_source=audio_source, threads=cores,
+            )
+            progress = (lambda done: on_progress(done, total_frames)) if on_progress else None
+            stats.merge(render_frames(video_path, info, plan, encoder, on_progress=progress))
+        else:
+            # Share the job's cores between the workers' x264 encoders
+            threads = max(1, (cores or os.cpu_count() or 1) // workers)
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as parts_dir:
+                part_paths = [os.path.join(parts_dir, f"part_{i:05d}.mp4") for i in range(len(chunks))]
+                context = multiprocessing.get_context("spawn")
+                with context.Manager() as manager, ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                    cancel_event = manager.Event()
+                    futures = [
+                        pool.submit(
+                            render_chunk, video_path, info, subtitle_data, template, part_path, start_frame, frame_count,
+                            threads, cancel_event,
+                        )
+                        for part_path, (start_frame, frame_count) in zip(part_paths, chunks)
+                    ]
+                    try:
+                        frames_done, pending = 0, set(futures)
+                        while pending:
+                            # Wake up regularly even while chunks run, so on_progress can cancel the job
+                            finished, pending = wait(pending, timeout=PROGRESS_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                            for future in finished:
+                                part_report = future.result()
+                                stats.merge(part_report)
+                                frames_done += part_report["frames"]
+                            if on_progress:
+                                on_progress(frames_done, total_frames)
+                    except BaseException:
+                        # Stop the running chunks and wait for them before the parts are deleted
+                        cancel_event.set()
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        raise
+
+                concat_videos(part_paths, output_path, audio_source=audio_source)
+
+    stats.wall_seconds = time.perf_counter() - started
+    report = stats.report(
+        video=video_path,
+        output=output_path,
+        width=info["width"],
+        height=info["height"],
+        source_fps=info["fps"],
+        workers=workers,
+        chunks=len(chunks),
+        profile=profiler.summary,
+    )
+    if report_path:
+        write_report(report, report_path)
+    return report
@@ -1,7 +1,9 @@
+import numpy as np
 import streamlit as st
-import json
-import os
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+from compositing import dilate_mask, shadow_mask
+from glyph_atlas import get_text_engine
+from template_registry import get_template_registry, TemplateError
 
 # Default values
 DEFAULT_VALUES = {
@@ -13,6 +15,8 @@ DEFAULT_VALUES = {
     "outline_thickness": 1,
     "shadow_color": "#333333",
     "shadow_opacity": 0.5,
+    "shadow_blur": 0,
+    "shadow_offset": 2,
     "text_alignment": "center",
     "bg_color": "#B22222",
     "bg_opacity": 1.0,
@@ -23,8 +27,6 @@ DEFAULT_VALUES = {
     "animation_speed": 1.5
 }
 
-TEMPLATE_DIR = "Templates"
-os.makedirs(TEMPLATE_DIR, exist_ok=True)
 
 def hex_to_rgba(hex_color, opacity=1.0):
     hex_color = hex_color.lstrip('#')
@@ -33,18 +35,15 @@ def hex_to_rgba(hex_color, opacity=1.0):
 
 def generate_preview(text, text_color, font_size, font_family, outline_color, outline_thickness, 
                      shadow_color, shadow_opacity, text_alignment, bg_color, bg_opacity,
-                     highlight_color, highlight_bg_color, highlight_bg_opacity):
+                     highlight_color, highlight_bg_color, highlight_bg_opacity, shadow_blur=0, shadow_offset=2):
+    """Draws the sample text with the renderer's own text engine and effects, so it matches the video."""
     width, height = 600, 150
     image = Image.new("RGBA", (width, height), hex_to_rgba(bg_color, bg_opacity))
     draw = ImageDraw.Draw(image)
     
-    try:
-        font = ImageFont.truetype(font_family, int(font_size * 40))
-    except:
-        font = ImageFont.load_default()
-    
-    bbox = draw.textbbox((0, 0), text, font=font)
-    text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    text_engine = get_text_engine(font_family, font_size, outline_thickness)
+    (text_w, ascent), descent = text_engine.text_size(text)
+    text_h = ascent + descent
     
     if text_alignment == "center":
         text_x = (width - text_w) // 2
@@ -53,6 +52,7 @@ def generate_preview(text, text_color, font_size, font_family, outline_color, ou
     else:
         text_x = width - text_w - 20
     text_y = (height - text_h) // 2  
+    baseline = (text_x, text_y + ascent)
     
     # Draw highlight background
     highlight_padding = 10
@@ -62,18 +62,19 @@ def generate_preview(text, text_color, font_size, font_family, outline_color, ou
         fill=hex_to_rgba(highlight_bg_color, highlight_bg_opacity)
     )
     
+    fill_mask = np.zeros((height, width), np.uint8)
+    text_engine.draw(fill_mask, text, baseline)
+    outline_mask = dilate_mask(fill_mask, text_engine.outline)
+    
     # Draw shadow
     if shadow_opacity > 0:
-        shadow_offset = 2
-        draw.text((text_x + shadow_offset, text_y + shadow_offset), text, font=font, fill=shadow_color)
-    
-    # Draw outline
-    for offset in [-outline_thickness, outline_thickness]:
-        draw.text((text_x + offset, text_y), text, font=font, fill=outline_color)
-        draw.text((text_x, text_y + offset), text, font=font, fill=outline_color)
+        shadow = shadow_mask(outline_mask, shadow_offset, shadow_offset, shadow_blur, shadow_opacity)
+        image.paste(hex_to_rgba(shadow_color), mask=Image.fromarray(shadow))
     
-    # Draw main text
-    draw.text((text_x, text_y), text, font=font, fill=text_color)
+    # Draw outline, then main text
+    if text_engine.outline > 0:
+        image.paste(hex_to_rgba(outline_color), mask=Image.fromarray(outline_mask))
+    image.paste(hex_to_rgba(text_color), mask=Image.fromarray(fill_mask))
     
     return image
 
@@ -89,6 +90,8 @@ def template_designer_tool():
             outline_thickness = st.slider("Outline Thickness", 0, 5, DEFAULT_VALUES["outline_thickness"])
             shadow_color = st.color_picker("Shadow Color", DEFAULT_VALUES["shadow_color"])
             shadow_opacity = st.slider("Shadow Opacity", 0.0, 1.0, DEFAULT_VALUES["shadow_opacity"])
+            shadow_blur = st.slider("Shadow Blur", 0, 20, DEFAULT_VALUES["shadow_blur"])
+            shadow_offset = st.slider("Shadow Offset", 0, 10, DEFAULT_VALUES["shadow_offset"])  # 0 makes a glow
     
     with col2:
         with st.expander("📐 Content Positioning", expanded=True):
@@ -107,7 +110,7 @@ def template_designer_tool():
     preview_image = generate_preview(
         DEFAULT_VALUES["text"], text_color, font_size, font_family, outline_color, outline_thickness,
         shadow_color, shadow_opacity, text_alignment, bg_color, bg_opacity,
-        highlight_color, highlight_bg_color, highlight_bg_opacity
+        highlight_color, highlight_bg_color, highlight_bg_opacity, shadow_blur, shadow_offset
     )
     
     st.subheader("🔍 Live Preview")
@@ -118,13 +121,17 @@ def template_designer_tool():
     # Save Template
     template_name = st.text_input("Template Name")  # Text input for template name
     if st.button("Save Template"):
-        template_data = json.dumps({
-            "text_design": {"text_color": text_color, "font_size": font_size, "font_family": font_family, "outline_color": outline_color, "outline_thickness": outline_thickness, "shadow_color": shadow_color, "shadow_opacity": shadow_opacity},
-            "content_positioning": {"text_alignment": text_alignment, "bg_color": bg_color, "bg_opacity": bg_opacity},
-            "animation_effects": {"highlight_color": highlight_color, "highlight_bg_color": highlight_bg_color, "highlight_bg_opacity": highlight_bg_opacity, "animation_type": animation_type, "animation_speed": animation_speed}
-        }, indent=4)
-        with open(f"{TEMPLATE_DIR}/template.json", "w") as f:
-            f.write(template_data)
-        st.success("Template saved successfully!")
+        # Saved in the renderer's layout (stroke_*, text_design.highlight_color) and checked against its schema
+        template_data = {
+            "text_design": {"text_color": text_color, "font_size": font_size, "font_family": font_family, "stroke_color": outline_color, "stroke_thickness": outline_thickness, "shadow_color": shadow_color, "shadow_opacity": shadow_opacity, "shadow_blur": shadow_blur, "shadow_offset_x": shadow_offset, "shadow_offset_y": shadow_offset, "highlight_color": highlight_color, "text_alignment": text_alignment},
+            "content_positioning": {"bg_color": bg_color, "bg_opacity": bg_opacity},
+            "animation_effects": {"highlight_bg_color": highlight_bg_color, "highlight_bg_opacity": highlight_bg_opacity, "animation_type": animation_type, "animation_speed": animation_speed}
+        }
+        try:
+            get_template_registry().save(template_name.strip() or "template", template_data)
+            st.success("Template saved successfully!")
+        except TemplateError as e:
+            st.error("Template not saved: " + "; ".join(e.problems))
 
-template_designer_tool()
+if __name__ == "__main__":
+    template_designer_tool()
@@ -0,0 +1,388 @@
+"""Subtitle templates: one schema, migrations from older layouts, and compiled templates.
+
+Templates are JSON files in Templates/. The registry migrates each file to
+the current layout, validates it against SCHEMA and compiles it into an
+immutable CompiledTemplate with colors converted and numbers typed, so the
+renderer never reads raw JSON. Compiled templates are cached per file and
+recompiled when the file's mtime or size changes.
+
+    python template_registry.py            # validate every template
+    python template_registry.py --migrate  # also rewrite them in the current layout
+"""
+import argparse
+import copy
+import json
+import os
+import re
+import sys
+import threading
+
+from disk_cache import write_atomic
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Templates")
+TEMPLATE_VERSION = 2
+
+COLOR_PATTERN = re.compile(r"^#?[0-9A-Fa-f]{6}$")
+TEMPLATE_NAME_PATTERN = re.compile(r"^[\w\- ]+$")
+EMOJI_POSITIONS = [f"{v}-{h}" for v in ("top", "bottom") for h in ("left", "center", "right")]
+
+
+def color(default):
+    return {"type": "color", "default": default}
+
+
+def number(default, minimum=None, maximum=None):
+    return {"type": "number", "default": default, "min": minimum, "max": maximum}
+
+
+def boolean(default):
+    return {"type": "bool", "default": default}
+
+
+def choice(default, choices):
+    return {"type": "choice", "default": default, "choices": choices}
+
+
+def text(default):
+    return {"type": "text", "default": default}
+
+
+# Every setting the renderer reads, by section; a key these sections don't know is rejected as a typo
+SCHEMA = {
+    "text_design": {
+        "font_family": text("arial.ttf"),
+        "font_weight": choice("normal", ["normal", "bold"]),
+        "italic": boolean(False),
+        "font_size": number(1.5, minimum=0.1, maximum=10),
+        "text_color": color("#FFFFFF"),
+        "highlight_color": color("#FF0000"),
+        "stroke_color": color("#000000"),
+        "stroke_thickness": number(3, minimum=0, maximum=50),
+        "shadow_color": color("#000000"),
+        "shadow_opacity": number(0.0, minimum=0, maximum=1),
+        "shadow_blur": number(0, minimum=0, maximum=100),
+        "shadow_offset_x": number(2, minimum=-100, maximum=100),
+        "shadow_offset_y": number(2, minimum=-100, maximum=100),
+        "letter_spacing": number(0, minimum=-50, maximum=200),
+        "line_spacing": number(1.2, minimum=0.1, maximum=10),
+        "text_alignment": choice("center", ["left", "center", "right"]),
+        "text_case": choice("none", ["none", "uppercase", "lowercase", "capitalize"]),
+    },
+    "content_positioning": {
+        "padding_x": number(30, minimum=0),
+        "padding_y": number(20, minimum=0),
+        "show_box": boolean(False),
+        "bg_color": color("#FFFF99"),
+        "bg_opacity": number(1.0, minimum=0, maximum=1),
+        "max_line_chars": number(40, minimum=1),
+        "multi_line": boolean(False),
+        "box_vertical_position": number(850, minimum=0),
+    },
+    "emoji_config": {
+        "emoji_path": text(None),
+        "emoji_scale": number(1.0, minimum=0.01, maximum=20),
+        "emoji_opacity": number(1.0, minimum=0, maximum=1),
+        "emoji_position": choice("top-right", EMOJI_POSITIONS),
+        "emoji_margin_x": number(10),
+        "emoji_margin_y": number(10),
+    },
+}
+
+# (old section, old key) -> (new section, new key); older layouts, mostly from the template designer
+MIGRATIONS = {
+    ("text_design", "outline_thickness"): ("text_design", "stroke_thickness"),
+    ("text_design", "outline_color"): ("text_design", "stroke_color"),
+    ("text_design", "font_style"): ("text_design", "font_family"),
+    ("animation_effects", "highlight_color"): ("text_design", "highlight_color"),
+    ("content_positioning", "text_alignment"): ("text_design", "text_alignment"),
+}
+
+
+# Settings the shipped templates and the designer write that the renderer does not read; kept, not checked
+DESIGN_ONLY_KEYS = {
+    "content_positioning": {"text_position", "box_position", "box_width", "box_height", "adaptive_scaling"},
+    "emoji_config": {"emoji_offset_y"},
+}
+# Sections outside SCHEMA that templates may carry as they are
+FREE_SECTIONS = {"animation_effects"}
+
+
+class TemplateError(ValueError):
+    """A template that does not match the schema; problems lists every mismatch."""
+
+    def __init__(self, name, problems):
+        self.name = name
+        self.problems = problems
+        super().__init__(f"Invalid template {name}: " + "; ".join(problems))
+
+
+def hex_to_bgr(hex_color):
+    """Convert HEX color (#RRGGBB) to BGR tuple for OpenCV."""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (4, 2, 0))  # Convert to BGR
+
+
+def migrate_template(template):
+    """Returns a copy of a template in the current layout; keys already in place win over old ones."""
+    migrated = copy.deepcopy(template)
+    for (old_section, old_key), (new_section, new_key) in MIGRATIONS.items():
+        section = migrated.get(old_section)
+        if isinstance(section, dict) and old_key in section:
+            value = section.pop(old_key)
+            migrated.setdefault(new_section, {}).setdefault(new_key, value)
+    migrated["version"] = TEMPLATE_VERSION
+    return migrated
+
+
+def check_value(spec, value):
+    """Returns a problem description for a value that does not fit its spec, or None."""
+    kind = spec["type"]
+    if value is None:
+        return None if spec["default"] is None else "must not be null"
+    if kind == "color":
+        if not isinstance(value, str) or not COLOR_PATTERN.match(value):
+            return f"expected a #RRGGBB color, got {value!r}"
+    elif kind == "number":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f"expected a number, got {value!r}"
+        if spec["min"] is not None and value < spec["min"]:
+            return f"must be at least {spec['min']}, got {value}"
+        if spec["max"] is not None and value > spec["max"]:
+            return f"must be at most {spec['max']}, got {value}"
+    elif kind == "bool":
+        if not isinstance(value, bool):
+            return f"expected true or false, got {value!r}"
+    elif kind == "choice":
+        if not isinstance(value, str) or value.lower() not in spec["choices"]:
+            return f"expected one of {', '.join(spec['choices'])}, got {value!r}"
+    elif not isinstance(value, str):
+        return f"expected text, got {value!r}"
+    return None
+
+
+def validate_template(template, name="template"):
+    """Raises TemplateError listing every setting that does not match SCHEMA."""
+    if not isinstance(template, dict):
+        raise TemplateError(name, ["expected a JSON object"])
+    problems = [
+        f"{key}: unknown section" for key in template if key not in SCHEMA and key not in FREE_SECTIONS and key != "version"
+    ]
+    for section_name, fields in SCHEMA.items():
+        section = template.get(section_name, {})
+        if not isinstance(section, dict):
+            problems.append(f"{section_name}: expected an object")
+            continue
+        for key, value in section.items():
+            if key in fields:
+                problem = check_value(fields[key], value)
+                if problem:
+                    problems.append(f"{section_name}.{key}: {problem}")
+            elif key not in DESIGN_ONLY_KEYS.get(section_name, ()):
+                problems.append(f"{section_name}.{key}: unknown setting")
+    if problems:
+        raise TemplateError(name, problems)
+
+
+class CompiledTemplate:
+    """A validated template with every setting resolved, typed and colors in BGR. Immutable."""
+
+    __slots__ = (
+        "name", "font_family", "bold", "italic", "font_scale", "thickness",
+        "font_color", "highlight_color", "stroke_color", "shadow_color", "shadow_opacity", "shadow_blur",
+        "shadow_offset_x", "shadow_offset_y",
+        "letter_spacing", "line_spacing", "text_alignment", "text_case",
+        "padding_x", "padding_y", "show_box", "bg_color", "bg_opacity",
+        "max_line_chars", "multi_line", "box_vertical_position",
+        "emoji_path", "emoji_scale", "emoji_opacity", "emoji_position", "emoji_margin_x", "emoji_margin_y",
+    )
+
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            object.__setattr__(self, field, fields[field])
+
+    def __setattr__(self, field, value):
+        raise AttributeError(f"CompiledTemplate is immutable; cannot set {field}")
+
+    def __delattr__(self, field):
+        raise AttributeError(f"CompiledTemplate is immutable; cannot delete {field}")
+
+    def __reduce__(self):
+        # Sent to render worker processes; rebuilt through __init__ since __setattr__ is blocked
+        return (rebuild_template, (self.as_dict(),))
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.name!r})"
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def rebuild_template(fields):
+    return CompiledTemplate(**fields)
+
+
+def compile_template(template, name="template"):
+    """Migrates, validates and compiles a raw template dict."""
+    template = migrate_template(template or {})
+    validate_template(template, name)
+
+    def setting(section_name, key):
+        value = template.get(section_name, {}).get(key)
+        return SCHEMA[section_name][key]["default"] if value is None else value
+
+    text_design = lambda key: setting("text_design", key)
+    positioning = lambda key: setting("content_positioning", key)
+    emoji = lambda key: setting("emoji_config", key)
+
+    return CompiledTemplate(
+        name=name,
+        font_family=text_design("font_family"),
+        bold=text_design("font_weight").lower() == "bold",
+        italic=text_design("italic"),
+        font_scale=float(text_design("font_size")),
+        thickness=int(text_design("stroke_thickness")),
+        font_color=hex_to_bgr(text_design("text_color")),
+        highlight_color=hex_to_bgr(text_design("highlight_color")),
+        stroke_color=hex_to_bgr(text_design("stroke_color")),
+        shadow_color=hex_to_bgr(text_design("shadow_color")),
+        shadow_opacity=float(text_design("shadow_opacity")),
+        shadow_blur=int(text_design("shadow_blur")),
+        shadow_offset_x=int(text_design("shadow_offset_x")),
+        shadow_offset_y=int(text_design("shadow_offset_y")),
+        letter_spacing=int(text_design("letter_spacing")),
+        line_spacing=float(text_design("line_spacing")),
+        text_alignment=text_design("text_alignment").lower(),
+        text_case=text_design("text_case").lower(),
+        padding_x=int(positioning("padding_x")),
+        padding_y=int(positioning("padding_y")),
+        show_box=positioning("show_box"),
+        bg_color=hex_to_bgr(positioning("bg_color")),
+        bg_opacity=float(positioning("bg_opacity")),
+        max_line_chars=int(positioning("max_line_chars")),
+        multi_line=positioning("multi_line"),
+        box_vertical_position=int(positioning("box_vertical_position")),
+        emoji_path=emoji("emoji_path"),
+        emoji_scale=float(emoji("emoji_scale")),
+        emoji_opacity=float(emoji("emoji_opacity")),
+        emoji_position=emoji("emoji_position").lower(),
+        emoji_margin_x=int(emoji("emoji_margin_x")),
+        emoji_margin_y=int(emoji("emoji_margin_y")),
+    )
+
+
+DEFAULT_TEMPLATE = compile_template({}, "Default")
+
+
+class TemplateRegistry:
+    """The templates in one directory, compiled on demand and cached by file mtime and size."""
+
+    def __init__(self, directory=TEMPLATE_DIR):
+        self.directory = directory
+        self._compiled = {}  # absolute path -> ((mtime_ns, size), CompiledTemplate)
+        self._lock = threading.Lock()
+
+    def names(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(f[:-len(".json")] for f in os.listdir(self.directory) if f.endswith(".json"))
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, name):
+        """The named template as a dict in the current layout, validated."""
+        return self.load_file(self.path(name))
+
+    def load_file(self, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                template = migrate_template(json.load(f))
+            except json.JSONDecodeError as e:
+                raise TemplateError(name, [f"not valid JSON ({e})"]) from None
+        validate_template(template, name)
+        return template
+
+    def get(self, name):
+        """The named template compiled; None or "Default" is the built-in default."""
+        if not name or name == "Default":
+            return DEFAULT_TEMPLATE
+        return self.get_file(self.path(name))
+
+    def get_file(self, path):
+        """Compiles a template file, reusing the cached result while the file is unchanged."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._compiled.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+        compiled = compile_template(self.load_file(path), os.path.splitext(os.path.basename(path))[0])
+        with self._lock:
+            self._compiled[path] = (version, compiled)
+        return compiled
+
+    def save(self, name, template):
+        """Validates a template and writes it in the current layout; returns its path."""
+        if not TEMPLATE_NAME_PATTERN.match(name):
+            raise TemplateError(name, ["names may only use letters, digits, spaces, '-' and '_'"])
+        template = migrate_template(template)
+        validate_template(template, name)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(name)
+        write_atomic(path, (json.dumps(template, indent=4) + "\n").encode("utf-8"))
+        return path
+
+
+_registry = None
+
+
+def get_template_registry():
+    """The process-wide registry for Templates/."""
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry()
+    return _registry
+
+
+def resolve_template(template):
+    """Compiles whatever a caller passes as a template.
+
+    Accepts a CompiledTemplate, a raw dict, a template name, a path to a
+    .json file, or None / "Default".
+    """
+    if isinstance(template, CompiledTemplate):
+        return template
+    if isinstance(template, dict):
+        return compile_template(template)
+    if template and template.endswith(".json"):
+        return get_template_registry().get_file(template)
+    return get_template_registry().get(template)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate (and optionally migrate) the subtitle templates.")
+    parser.add_argument("--directory", default=TEMPLATE_DIR)
+    parser.add_argument("--migrate", action="store_true", help="Rewrite valid templates in the current layout")
+    args = parser.parse_args(argv)
+
+    registry = TemplateRegistry(args.directory)
+    failed = 0
+    for name in registry.names():
+        try:
+            template = registry.load(name)
+        except TemplateError as e:
+            failed += 1
+            print(f"✗ {name}")
+            for problem in e.problems:
+                print(f"    {problem}")
+            continue
+        if args.migrate:
+            registry.save(name, template)
+        print(f"✓ {name}" + (" (migrated)" if args.migrate else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
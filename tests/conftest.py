@@ -0,0 +1,23 @@
+"""Tests run from the repository root with `python -m pytest`; the app's modules are top-level."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def cache_root(tmp_path, monkeypatch):
+    """Points every DiskCache at a fresh directory, with no cache left over from other tests."""
+    import asset_cache
+    import disk_cache
+    import transcription_cache
+    import tts_synthesis
+
+    monkeypatch.setattr(disk_cache, "CACHE_ROOT", str(tmp_path))
+    monkeypatch.setattr(asset_cache, "_disk_cache", None)
+    monkeypatch.setattr(asset_cache, "_memory_cache", asset_cache.SpriteCache(asset_cache.MEMORY_CACHE_SIZE))
+    monkeypatch.setattr(transcription_cache, "_cache", None)
+    monkeypatch.setattr(tts_synthesis, "_audio_cache", None)
+    return tmp_path
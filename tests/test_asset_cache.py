@@ -0,0 +1,89 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+import asset_cache
+from asset_cache import SpriteCache, get_asset_cache, load_overlay_asset, read_asset_bytes, sprite_bytes
+
+
+def write_png(path, color, size=8, alpha=255):
+    image = np.zeros((size, size, 4), np.uint8)
+    image[:] = (*color, alpha)
+    cv2.imwrite(str(path), image)
+    return str(path)
+
+
+def test_sprite_cache_evicts_the_least_recently_used():
+    cache = SpriteCache(2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: None)  # a is now the most recent
+    cache.get("c", lambda: 3)
+    assert list(cache.entries) == ["a", "c"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_sprite_cache_bounds_the_bytes_it_holds():
+    layer = lambda: {"color": np.zeros((10, 10, 3), np.float32), "words": [(0, None, np.zeros((10, 10), np.uint8))]}
+    assert sprite_bytes(layer()) == 1300
+    cache = SpriteCache(8, max_bytes=3000)
+    for key in "abc":
+        cache.get(key, layer)
+    assert list(cache.entries) == ["b", "c"] and cache.bytes == 2600
+    cache.get("big", lambda: np.zeros(4000, np.uint8))  # Over the budget on its own, but still kept
+    assert list(cache.entries) == ["big"] and cache.bytes == 4000
+
+def test_overlays_are_premultiplied_and_reused(cache_root, tmp_path):
+    path = write_png(tmp_path / "red.png", (0, 0, 255), alpha=128)
+    image = load_overlay_asset(path, scale=2.0, opacity=0.5)
+    assert image.shape == (16, 16, 4)
+    assert tuple(image[0, 0]) == (0, 0, 64, 64)
+    assert load_overlay_asset(path, scale=2.0, opacity=0.5) is image  # Served from memory
+
+
+def test_memory_cache_is_bounded(cache_root, tmp_path, monkeypatch):
+    monkeypatch.setattr(asset_cache, "_memory_cache", SpriteCache(3))
+    for i in range(6):
+        load_overlay_asset(write_png(tmp_path / f"{i}.png", (i, i, i)))
+    assert len(asset_cache._memory_cache.entries) == 3
+
+
+def test_disk_cache_is_bounded(cache_root, tmp_path, monkeypatch):
+    monkeypatch.setattr(asset_cache, "MAX_ASSET_CACHE_BYTES", 3000)  # About three 16x16 variants
+    for i in range(8):
+        load_overlay_asset(write_png(tmp_path / f"{i}.png", (i, i, i)), scale=2.0)
+    cache = get_asset_cache()
+    stored = [name for name in os.listdir(cache.directory) if name.endswith(".npy")]
+    assert 1 <= len(stored) <= 3
+    assert sum(os.path.getsize(cache.path(name)) for name in stored) <= 3000
+
+
+def test_variants_come_back_from_disk_in_a_new_process(cache_root, tmp_path, monkeypatch):
+    path = write_png(tmp_path / "blue.png", (255, 0, 0))
+    first = load_overlay_asset(path, scale=0.5)
+    monkeypatch.setattr(asset_cache, "_memory_cache", SpriteCache(8))  # As if in another process
+    monkeypatch.setattr(asset_cache, "prepare_overlay", lambda *args: pytest.fail("decoded again"))
+    assert np.array_equal(load_overlay_asset(path, scale=0.5), first)
+
+
+def test_concurrent_loads_share_one_variant(cache_root, tmp_path):
+    path = write_png(tmp_path / "green.png", (0, 255, 0))
+    with ThreadPoolExecutor(8) as pool:
+        images = list(pool.map(lambda opacity: load_overlay_asset(path, opacity=opacity), [0.5] * 4 + [1.0] * 4))
+    assert all(image is images[0] for image in images[:4]) and all(image is images[4] for image in images[4:])
+    leftovers = [name for name in os.listdir(get_asset_cache().directory) if name.endswith(".tmp")]
+    assert leftovers == []
+
+
+def test_failed_download_is_logged(cache_root, monkeypatch, caplog):
+    def unreachable(url, timeout):
+        raise OSError("unreachable")
+
+    monkeypatch.setattr(asset_cache.urllib.request, "urlopen", unreachable)
+    with caplog.at_level(logging.WARNING, logger="asset_cache"):
+        assert read_asset_bytes("https://example.invalid/emoji.png") is None
+    assert "Could not download image from https://example.invalid/emoji.png" in caplog.text
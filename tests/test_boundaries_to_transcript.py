@@ -0,0 +1,57 @@
+from tts_synthesis import TICKS_PER_SECOND, boundaries_to_transcript
+
+
+def boundaries(spoken):
+    """One WordBoundary event per spoken word, half a second each."""
+    return [
+        {"text": word, "offset": i * TICKS_PER_SECOND // 2, "duration": TICKS_PER_SECOND // 4}
+        for i, word in enumerate(spoken.split())
+    ]
+
+
+def segment_texts(spoken, script):
+    return [segment["text"] for segment in boundaries_to_transcript(boundaries(spoken), script)["segments"]]
+
+
+def test_words_get_their_punctuation_and_sentences_split():
+    assert segment_texts("Hello there How are you", "Hello there! How are you?") == [" Hello there!", " How are you?"]
+
+
+def test_line_breaks_end_segments():
+    assert segment_texts("Title Body text", "Title\nBody text") == [" Title", " Body text"]
+
+
+def test_number_spoken_as_words_does_not_lose_the_rest():
+    script = "I have 5 apples. Then more text. And more, ok."
+    assert segment_texts("I have five apples Then more text And more ok", script) == [
+        " I have five apples.", " Then more text.", " And more, ok.",
+    ]
+
+
+def test_sentence_ending_inside_skipped_words_still_splits():
+    assert segment_texts("It costs five dollars Then we left", "It costs $5.\nThen we left.") == [
+        " It costs five dollars", " Then we left.",
+    ]
+
+
+def test_repeated_word_far_ahead_is_not_matched_early():
+    script = "Call 911 now, then wait for help to arrive and call again."
+    texts = segment_texts("Call nine one one now then wait for help to arrive and call again", script)
+    assert texts == [" Call nine one one now, then wait for help to arrive and call again."]
+
+
+def test_hyphenated_word_spoken_in_parts_is_one_word():
+    transcript = boundaries_to_transcript(boundaries("A well known fact"), "A well-known fact.")
+    words = [word["word"] for word in transcript["segments"][0]["words"]]
+    assert words == [" A", " well-known", " fact."]
+
+
+def test_word_timings_come_from_the_boundaries():
+    word = boundaries_to_transcript(boundaries("Hi"), "Hi.")["segments"][0]["words"][0]
+    assert (word["start"], word["end"]) == (0.0, 0.25)
+
+
+def test_unmatched_word_is_not_found_inside_a_later_word():
+    transcript = boundaries_to_transcript(boundaries("a well known fact"), "A well-known fact.")
+    words = [word["word"] for word in transcript["segments"][0]["words"]]
+    assert words == [" a", " well-known", " fact."]
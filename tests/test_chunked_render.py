@@ -0,0 +1,66 @@
+import shutil
+import subprocess
+
+import pytest
+
+from ffmpeg_io import concat_list_entry, concat_videos, probe_video
+from subtitle_renderer import plan_chunks
+
+INFO = {"fps": 30.0, "duration": 60.0, "start_time": 0.0}
+TOTAL_FRAMES = 1800
+
+
+def assert_tiles(chunks, total_frames):
+    """Chunks start at 0, each starts where the previous ends, and the open last chunk starts before the end."""
+    assert chunks[0][0] == 0
+    for (start, count), (next_start, _) in zip(chunks, chunks[1:]):
+        assert count > 0 and start + count == next_start
+    assert chunks[-1][1] is None and chunks[-1][0] < total_frames
+
+
+@pytest.mark.parametrize("keyframe_times", [
+    [],  # No keyframe index
+    [0.0],
+    [i * 7.0 for i in range(9)],  # Sparse: one every 7 s
+    [i / 30 for i in range(1800)],  # Dense: every frame
+    [i * 2.5 for i in range(24)] + [60.0, 61.0],  # Keyframes at and past the end
+])
+def test_chunks_tile_the_video(keyframe_times):
+    assert_tiles(plan_chunks(keyframe_times, INFO, 10), TOTAL_FRAMES)
+
+
+def test_chunks_start_on_keyframes_at_least_chunk_seconds_apart():
+    assert plan_chunks([i * 7.0 for i in range(9)], INFO, 10) == [(0, 420), (420, 420), (840, 420), (1260, 420),
+                                                                 (1680, None)]
+    assert plan_chunks([i / 30 for i in range(1800)], INFO, 10) == [(0, 300), (300, 300), (600, 300), (900, 300),
+                                                                    (1200, 300), (1500, None)]
+
+
+def test_missing_keyframes_leave_one_chunk():
+    assert plan_chunks([], INFO, 10) == [(0, None)]
+
+
+def test_keyframes_are_measured_from_the_stream_start():
+    info = {**INFO, "start_time": 1.0}
+    assert plan_chunks([1.0, 11.0, 21.0], info, 10) == [(0, 300), (300, 300), (600, None)]
+
+
+def test_concat_list_escapes_quotes():
+    assert concat_list_entry("/tmp/it's/part.mp4") == "file '/tmp/it'\\''s/part.mp4'\n"
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_concat_videos_in_a_directory_with_a_quote(tmp_path):
+    directory = tmp_path / "it's parts"
+    directory.mkdir()
+    part_paths = []
+    for i in range(2):
+        part_paths.append(str(directory / f"part_{i}.mp4"))
+        subprocess.run([
+            "ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=64x64:rate=10:duration=1",
+            "-pix_fmt", "yuv420p", part_paths[-1],
+        ], check=True)
+
+    output_path = str(directory / "joined.mp4")
+    concat_videos(part_paths, output_path)
+    assert probe_video(output_path)["duration"] == pytest.approx(2.0, abs=0.15)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from compositing import blend_premultiplied, blend_roi, clip_region, fill_rect
+
+
+def straight_to_premultiplied(bgr, alpha):
+    """BGRA overlay as the asset cache stores it: color premultiplied by alpha and rounded."""
+    color = np.round(bgr.astype(np.float64) * alpha[..., None] / 255.0)
+    return np.concatenate([color, alpha[..., None]], axis=2).astype(np.uint8)
+
+
+def reference_over(frame, bgr, alpha):
+    """Straight-alpha "over" in floating point."""
+    a = alpha[..., None].astype(np.float64) / 255.0
+    return bgr.astype(np.float64) * a + frame.astype(np.float64) * (1.0 - a)
+
+
+def random_overlay(rng, height, width):
+    return rng.integers(0, 256, (height, width, 3), np.uint8), rng.integers(0, 256, (height, width), np.uint8)
+
+
+def test_blend_roi_rounds_the_division_exactly():
+    # Every background and inverse alpha pair, against round(roi * inverse / 255)
+    roi = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 256, axis=1)[..., None]
+    inverse = np.repeat(np.arange(256, dtype=np.uint16)[None, :], 256, axis=0)[..., None]
+    blended = roi.copy()
+    blend_roi(blended, np.uint16(0), inverse)
+    expected = np.floor(roi.astype(np.float64) * inverse / 255.0 + 0.5)
+    assert np.array_equal(blended, expected)
+
+
+def test_blend_premultiplied_is_within_one_lsb_of_float():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (64, 64, 3), np.uint8)
+    bgr, alpha = random_overlay(rng, 64, 64)
+    alpha[:8] = 0  # Fully transparent
+    alpha[8:16] = 255  # Fully opaque
+
+    blended = frame.copy()
+    blend_premultiplied(blended, 0, 0, straight_to_premultiplied(bgr, alpha))
+    error = np.abs(blended.astype(np.float64) - reference_over(frame, bgr, alpha))
+    assert error.max() <= 1.0
+    assert np.array_equal(blended[:8], frame[:8])
+    assert np.array_equal(blended[8:16], bgr[8:16])
+
+
+@pytest.mark.parametrize("opacity", [0.0, 0.1, 0.5, 0.75, 1.0])
+def test_fill_rect_is_within_one_lsb_of_float(opacity):
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, (32, 48, 3), np.uint8)
+    color = (12, 200, 255)
+
+    filled = frame.copy()
+    fill_rect(filled, 0, 0, 48, 32, color, opacity)
+    # Opacity is quantized to an 8-bit alpha first, as every other overlay's is
+    alpha = np.full((32, 48), round(opacity * 255), np.uint8)
+    expected = reference_over(frame, np.broadcast_to(np.array(color, np.uint8), frame.shape), alpha)
+    assert np.abs(filled.astype(np.float64) - expected).max() <= 1.0
+
+
+@pytest.mark.parametrize("x, y", [(-10, -5), (40, 20), (-10, 20), (40, -5), (5, 5)])
+def test_partially_clipped_overlay_matches_an_unclipped_render(x, y):
+    rng = np.random.default_rng(2)
+    frame = rng.integers(0, 256, (32, 48, 3), np.uint8)
+    bgr, alpha = random_overlay(rng, 16, 24)
+    pixels = straight_to_premultiplied(bgr, alpha)
+
+    # Blend onto a padded canvas where nothing is clipped, then crop back to the frame
+    pad = 32
+    canvas = np.zeros((32 + 2 * pad, 48 + 2 * pad, 3), np.uint8)
+    canvas[pad:-pad, pad:-pad] = frame
+    blend_premultiplied(canvas, x + pad, y + pad, pixels)
+
+    blended = frame.copy()
+    blend_premultiplied(blended, x, y, pixels)
+    assert np.array_equal(blended, canvas[pad:-pad, pad:-pad])
+
+
+@pytest.mark.parametrize("x, y", [(-24, 0), (48, 0), (0, -16), (0, 32), (-100, -100)])
+def test_off_frame_overlays_change_nothing(x, y):
+    frame = np.full((32, 48, 3), 90, np.uint8)
+    pixels = np.full((16, 24, 4), 255, np.uint8)
+    blend_premultiplied(frame, x, y, pixels)
+    fill_rect(frame, x, y, 24, 16, (255, 255, 255), 1.0)
+    assert (frame == 90).all()
+    assert clip_region(frame.shape, x, y, 24, 16) is None
+
+
+def test_clip_region_slices():
+    frame_region, overlay_region = clip_region((32, 48, 3), -10, 20, 24, 16)
+    assert frame_region == (slice(20, 32), slice(0, 14))
+    assert overlay_region == (slice(0, 12), slice(10, 24))
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+import disk_cache
+from disk_cache import DiskCache
+
+
+def entry(i, size=100):
+    return f"key{i}", bytes([i]) * size
+
+
+@pytest.fixture
+def cache(cache_root):
+    return DiskCache("test", max_bytes=500)
+
+
+def stored(cache):
+    return sorted(name for name in os.listdir(cache.directory) if not name.endswith(".tmp"))
+
+
+def test_round_trip(cache):
+    cache.put_bytes(*entry(1))
+    assert cache.get_bytes("key1") == entry(1)[1]
+    assert cache.get_bytes("missing") is None
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for i in range(5):
+        cache.put_bytes(*entry(i))
+    assert cache.get_bytes("key0") is not None  # key0 is now the most recently used
+
+    cache.put_bytes(*entry(5))
+    cache.put_bytes(*entry(6))
+    assert stored(cache) == ["key0", "key3", "key4", "key5", "key6"]
+    assert cache.get_bytes("key1") is None and cache.get_bytes("key2") is None
+    assert sum(os.path.getsize(cache.path(key)) for key in stored(cache)) <= cache.max_bytes
+
+
+def test_an_entry_larger_than_the_budget_is_kept_alone(cache):
+    cache.put_bytes(*entry(1))
+    cache.put_bytes("big", b"x" * 800)
+    assert stored(cache) == ["big"]
+
+
+def test_writes_below_the_budget_do_not_rescan(cache, monkeypatch):
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(1) or scan())
+    for i in range(5):
+        cache.put_bytes(*entry(i))
+    assert scans == []
+    cache.put_bytes(*entry(5))  # Over budget: count what is really on disk, then evict
+    assert scans == [1]
+
+
+def test_budget_holds_across_processes(cache_root):
+    # Two instances over one directory stand in for the app and a job worker
+    first = DiskCache("shared", 500)
+    for i in range(4):
+        first.put_bytes(*entry(i))
+    second = DiskCache("shared", 500)  # Counts what is on disk when it starts
+    for i in range(4, 8):
+        second.put_bytes(*entry(i))
+    assert stored(second) == ["key3", "key4", "key5", "key6", "key7"]
+
+
+def test_other_processes_writes_are_counted_after_rescan_seconds(cache_root, monkeypatch):
+    first, second = DiskCache("shared", 500), DiskCache("shared", 500)
+    for i in range(4):
+        first.put_bytes(*entry(i))
+    second.put_bytes(*entry(4))
+    monkeypatch.setattr(disk_cache, "RESCAN_SECONDS", 0.0)
+    second.put_bytes(*entry(5))  # Its own count is only 200 bytes, but it is due a rescan
+    assert stored(second) == ["key1", "key2", "key3", "key4", "key5"]
+
+
+def test_entry_evicted_by_another_process_is_a_miss(cache):
+    cache.put_bytes(*entry(1))
+    os.remove(cache.path("key1"))
+    assert cache.get_bytes("key1") is None
+    assert cache.get_path("key1") is None
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from compositing import dilate_mask
+from glyph_atlas import TrueTypeText, find_font, get_atlas
+
+
+def truetype_text(bold, italic, size=64, outline=3):
+    match = find_font("DejaVu Sans", bold, italic)
+    if match is None:
+        pytest.skip("no TrueType font installed")
+    path, synthetic_bold, synthetic_italic = match
+    return TrueTypeText(get_atlas(path, size, synthetic_bold, synthetic_italic), outline)
+
+
+@pytest.mark.parametrize("bold", [False, True])
+@pytest.mark.parametrize("italic", [False, True])
+@pytest.mark.parametrize("word", ["ff", "fj", "Wolf", "Tf", "y,", "gjq", "A"])
+def test_ink_box_holds_every_drawn_pixel_and_the_outline(word, bold, italic):
+    text = truetype_text(bold, italic)
+    left, top, right, bottom = text.ink_box(word)
+    origin = (400, 300)
+    mask = np.zeros((600, 1000), np.uint8)
+    text.draw(mask, word, origin)
+    ink = dilate_mask(mask, text.outline)
+
+    ys, xs = np.nonzero(ink)
+    assert xs.min() >= origin[0] + left and xs.max() < origin[0] + right
+    assert ys.min() >= origin[1] + top and ys.max() < origin[1] + bottom
+
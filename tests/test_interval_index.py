@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from subtitle_renderer import build_interval_index, find_interval
+
+
+def linear_scan(starts, ends, time_sec):
+    """Reference: the latest-starting interval covering time_sec, later entries winning ties."""
+    covering = [i for i in range(len(starts)) if starts[i] <= time_sec <= ends[i]]
+    return max(covering, key=lambda i: (starts[i], i)) if covering else None
+
+
+SEGMENTS = ([0.0, 2.0, 5.0], [1.5, 4.0, 6.0])
+
+
+@pytest.mark.parametrize("time_sec, expected", [
+    (-0.1, None),  # Before the first segment
+    (0.0, 0),  # Starts are inclusive
+    (1.5, 0),  # And so are ends
+    (1.75, None),  # Gap between segments
+    (2.0, 1),
+    (4.5, None),
+    (5.0, 2),
+    (6.0, 2),
+    (6.01, None),  # After the last segment
+])
+def test_boundaries_and_gaps(time_sec, expected):
+    assert find_interval(build_interval_index(*SEGMENTS), time_sec) == expected
+
+
+def test_overlapping_words_resolve_to_the_latest_start():
+    # Whisper words often overlap their neighbours slightly
+    starts, ends = [0.0, 0.4, 0.8], [0.5, 0.9, 1.2]
+    index = build_interval_index(starts, ends)
+    assert find_interval(index, 0.45) == 1
+    assert find_interval(index, 0.85) == 2
+
+
+def test_long_interval_is_found_behind_short_ones():
+    # A long early interval still covers times after shorter, later ones have ended
+    starts, ends = [0.0, 1.0, 2.0], [10.0, 1.5, 2.5]
+    index = build_interval_index(starts, ends)
+    assert find_interval(index, 1.2) == 1
+    assert find_interval(index, 3.0) == 0
+
+
+def test_unsorted_input_returns_original_positions():
+    starts, ends = [5.0, 0.0, 2.0], [6.0, 1.0, 3.0]
+    index = build_interval_index(starts, ends)
+    assert [find_interval(index, t) for t in (0.5, 2.5, 5.5)] == [1, 2, 0]
+
+
+def test_empty_index():
+    assert find_interval(build_interval_index([], []), 1.0) is None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_a_linear_scan(seed):
+    rng = random.Random(seed)
+    count = rng.randint(1, 40)
+    # Quarter-second grid so starts, ends and probe times often coincide exactly
+    starts = [rng.randint(0, 80) / 4 for _ in range(count)]
+    ends = [start + rng.randint(0, 12) / 4 for start in starts]
+    index = build_interval_index(starts, ends)
+
+    for step in range(-4, 100):
+        time_sec = step / 4 + rng.choice((0.0, 0.1))
+        assert find_interval(index, time_sec) == linear_scan(starts, ends, time_sec), time_sec
@@ -0,0 +1,57 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import job_queue
+from job_queue import get_owned_job, list_jobs, submit_job
+
+
+@pytest.fixture(autouse=True)
+def job_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_queue, "POOL_SIZE", 0)  # Never start workers from a test
+
+
+def panel_script():
+    import streamlit as st
+
+    from job_queue import job_panel
+
+    job = job_panel("tts_job", "tts")
+    st.write(f"result: {job['id'] if job else None}")
+
+
+def run_panel(job_id, owner=None):
+    app = AppTest.from_function(panel_script)
+    app.query_params["tts_job"] = job_id
+    if owner:
+        app.session_state["job_owner"] = owner
+    return app.run()
+
+
+def test_jobs_are_only_listed_for_their_owner():
+    mine = submit_job("tts", {}, start_workers=False, owner="me")
+    submit_job("tts", {}, start_workers=False, owner="someone-else")
+
+    assert [job["id"] for job in list_jobs("tts", owner="me")] == [mine]
+    assert get_owned_job(mine, "me")["id"] == mine
+    assert get_owned_job(mine, "someone-else") is None
+    assert get_owned_job(mine, None) is None
+
+
+def test_shared_url_shows_nothing_to_another_browser():
+    job_id = submit_job("tts", {}, start_workers=False, owner="me")
+
+    app = run_panel(job_id)
+    assert not app.exception
+    assert [info.value for info in app.info] == []  # No queue status, so no cancel button either
+    assert [text.value for text in app.markdown] == ["result: None"]
+    assert "owner" not in app.query_params  # The token never goes into the URL
+    assert app.session_state["job_owner"] != "me"
+
+
+def test_owner_reattaches_from_the_url():
+    job_id = submit_job("tts", {}, start_workers=False, owner="me")
+
+    app = run_panel(job_id, owner="me")
+    assert not app.exception
+    assert [info.value for info in app.info] == ["⏳ Queued (0 job(s) ahead)"]
@@ -0,0 +1,116 @@
+import json
+import os
+import pickle
+
+import pytest
+
+from template_registry import (
+    TEMPLATE_DIR, TEMPLATE_VERSION, TemplateError, TemplateRegistry, compile_template, migrate_template,
+    validate_template,
+)
+
+V1_DIR = os.path.join(os.path.dirname(__file__), "templates")
+SHIPPED = ["template", "template1"]
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("name", SHIPPED)
+def test_v1_templates_migrate_to_the_shipped_v2_files(name):
+    v1 = load_json(os.path.join(V1_DIR, f"v1_{name}.json"))
+    assert "version" not in v1
+    migrated = migrate_template(v1)
+    assert migrated == load_json(os.path.join(TEMPLATE_DIR, f"{name}.json"))
+    assert migrated["version"] == TEMPLATE_VERSION
+
+
+@pytest.mark.parametrize("name", SHIPPED)
+def test_shipped_v1_and_v2_templates_compile_alike(name):
+    v1 = compile_template(migrate_template(load_json(os.path.join(V1_DIR, f"v1_{name}.json"))), name)
+    v2 = TemplateRegistry().get(name)
+    assert v1.as_dict() == v2.as_dict()
+
+
+def test_migration_moves_renamed_keys():
+    migrated = migrate_template({
+        "text_design": {"outline_thickness": 4, "outline_color": "#112233", "font_style": "DejaVu Sans"},
+        "animation_effects": {"highlight_color": "#00FF00"},
+        "content_positioning": {"text_alignment": "left"},
+    })
+    assert migrated["text_design"] == {
+        "stroke_thickness": 4, "stroke_color": "#112233", "font_family": "DejaVu Sans",
+        "highlight_color": "#00FF00", "text_alignment": "left",
+    }
+    assert migrated["animation_effects"] == {} and migrated["content_positioning"] == {}
+
+
+def test_migration_keeps_keys_already_in_place():
+    migrated = migrate_template({"text_design": {"outline_thickness": 4, "stroke_thickness": 2}})
+    assert migrated["text_design"] == {"stroke_thickness": 2}
+
+
+def test_migration_leaves_the_input_alone():
+    template = {"text_design": {"outline_thickness": 4}}
+    migrate_template(template)
+    assert template == {"text_design": {"outline_thickness": 4}}
+
+
+def test_compiled_values_are_typed():
+    compiled = compile_template(migrate_template({"text_design": {"font_size": 2, "text_color": "#102030"}}))
+    assert compiled.font_scale == 2.0 and compiled.font_color == (0x30, 0x20, 0x10)
+    with pytest.raises(AttributeError):
+        compiled.font_scale = 3
+    assert pickle.loads(pickle.dumps(compiled)).as_dict() == compiled.as_dict()
+
+
+@pytest.mark.parametrize("template, problem", [
+    ({"text_design": {"font_szie": 2}}, "text_design.font_szie: unknown setting"),
+    ({"txt_design": {}}, "txt_design: unknown section"),
+    ({"text_design": {"font_size": "big"}}, "text_design.font_size: expected a number, got 'big'"),
+    ({"text_design": {"font_size": True}}, "text_design.font_size: expected a number, got True"),
+    ({"text_design": {"text_color": "white"}}, "text_design.text_color: expected a #RRGGBB color, got 'white'"),
+    ({"text_design": {"stroke_thickness": -1}}, "text_design.stroke_thickness: must be at least 0, got -1"),
+    ({"text_design": {"text_alignment": "middle"}}, "text_design.text_alignment: expected one of"),
+    ({"content_positioning": {"show_box": "yes"}}, "content_positioning.show_box: expected true or false, got 'yes'"),
+    ({"emoji_config": []}, "emoji_config: expected an object"),
+])
+def test_malformed_templates_are_rejected(template, problem):
+    with pytest.raises(TemplateError) as error:
+        validate_template(migrate_template(template), "broken")
+    assert any(p.startswith(problem) for p in error.value.problems), error.value.problems
+
+
+def test_every_problem_is_reported():
+    with pytest.raises(TemplateError) as error:
+        validate_template({"text_design": {"font_size": "big", "text_color": "white", "font_szie": 2}})
+    assert len(error.value.problems) == 3
+
+
+def test_non_object_template_is_rejected():
+    with pytest.raises(TemplateError, match="expected a JSON object"):
+        validate_template(["not", "a", "template"])
+
+
+def test_design_only_settings_are_kept():
+    template = migrate_template({"content_positioning": {"box_width": 800}, "animation_effects": {"fade_in": True}})
+    validate_template(template)
+    assert template["content_positioning"]["box_width"] == 800
+
+
+def test_registry_recompiles_a_changed_file(tmp_path):
+    registry = TemplateRegistry(str(tmp_path))
+    registry.save("mine", {"text_design": {"font_size": 2}})
+    first = registry.get("mine")
+    assert registry.get("mine") is first
+
+    registry.save("mine", {"text_design": {"font_size": 3.25}})
+    assert registry.get("mine").font_scale == 3.25
+
+
+def test_registry_rejects_invalid_json(tmp_path):
+    (tmp_path / "broken.json").write_text("{not json")
+    with pytest.raises(TemplateError, match="not valid JSON"):
+        TemplateRegistry(str(tmp_path)).load("broken")
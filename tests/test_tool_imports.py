@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("tool", ["mp4_subtitle_animation_tool", "mp3_word_timestamp_tool", "tts_tool"])
+def test_tools_leave_the_renderer_to_the_workers(tool):
+    # A fresh interpreter, since this one has long since imported everything
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import sys, {tool}; print(' '.join(sorted(sys.modules)))"],
+        cwd=REPO, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    assert not {"cv2", "subtitle_renderer", "engine", "whisper"} & set(loaded)
@@ -0,0 +1,34 @@
+import io
+
+from transcription_cache import cached_transcription, hash_file, save_upload_hashed, transcription_key
+from transcription_service import StubBackend
+
+
+def test_upload_hash_matches_the_saved_file(tmp_path):
+    data = b"not really audio" * 100000
+    path = tmp_path / "upload.mp3"
+    digest = save_upload_hashed(io.BytesIO(data), str(path), chunk_size=4096)
+    assert path.read_bytes() == data
+    assert digest == hash_file(str(path))
+
+
+def test_key_depends_on_every_setting():
+    base = transcription_key("hash", "whisper", "small", {"word_timestamps": True})
+    assert transcription_key("hash", "whisper", "small", {"word_timestamps": True}) == base
+    assert transcription_key("other", "whisper", "small", {"word_timestamps": True}) != base
+    assert transcription_key("hash", "vosk", "small", {"word_timestamps": True}) != base
+    assert transcription_key("hash", "whisper", "tiny", {"word_timestamps": True}) != base
+    assert transcription_key("hash", "whisper", "small", {"word_timestamps": False}) != base
+
+
+def test_repeat_audio_is_served_from_the_cache(cache_root):
+    backend = StubBackend()
+    transcribe = lambda: backend.transcribe("audio.mp3")
+
+    first = cached_transcription("hash", "stub", "small", {"word_timestamps": True}, transcribe)
+    assert cached_transcription("hash", "stub", "small", {"word_timestamps": True}, transcribe) == first
+    assert len(backend.calls) == 1
+
+    # Other settings are another entry
+    cached_transcription("hash", "stub", "small", {"word_timestamps": True, "long_form": True}, transcribe)
+    assert len(backend.calls) == 2
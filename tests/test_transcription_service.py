@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+import transcription_service
+from transcription_service import StubBackend, TranscriptionService, get_transcription_service
+
+
+def test_stub_backend_returns_evenly_spaced_words():
+    result = StubBackend(text="one two three", word_seconds=0.5).transcribe("audio.mp3")
+    words = result["segments"][0]["words"]
+    assert [word["word"] for word in words] == [" one", " two", " three"]
+    assert [(word["start"], word["end"]) for word in words] == [(0.0, 0.5), (0.5, 1.0), (1.0, 1.5)]
+
+
+def test_service_loads_its_backend_once(monkeypatch):
+    created = []
+
+    def factory(**kwargs):
+        created.append(StubBackend(**kwargs))
+        return created[-1]
+
+    monkeypatch.setitem(transcription_service.BACKENDS, "counting", factory)
+    service = TranscriptionService("counting", "tiny")
+    assert created == []  # Nothing is loaded until the first call
+    service.transcribe("a.mp3", language="en")
+    service.transcribe("b.mp3")
+    assert len(created) == 1
+    assert created[0].calls == [("a.mp3", {"language": "en"}), ("b.mp3", {})]
+
+
+def test_service_serializes_calls(monkeypatch):
+    active, peak = [0], [0]
+
+    class SlowBackend(StubBackend):
+        def transcribe(self, audio_path, **options):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.02)
+            active[0] -= 1
+            return super().transcribe(audio_path, **options)
+
+    monkeypatch.setitem(transcription_service.BACKENDS, "slow", SlowBackend)
+    service = TranscriptionService("slow")
+    threads = [threading.Thread(target=service.transcribe, args=(f"{i}.mp3",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 1
+
+
+def test_services_are_shared_per_backend_and_model(monkeypatch):
+    monkeypatch.setattr(transcription_service, "_services", {})
+    assert get_transcription_service("stub", "a") is get_transcription_service("stub", "a")
+    assert get_transcription_service("stub", "a") is not get_transcription_service("stub", "b")
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown transcription backend"):
+        TranscriptionService("nope")
+
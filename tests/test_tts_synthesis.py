@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+import tts_synthesis
+from tts_synthesis import CachedSynthesizer, FakeSynthesizer, split_script, synthesize_long_text
+
+# Forty distinct sentences, enough for several chunks at a small max_chars
+SENTENCES = [f"Sentence number {i} talks about topic {i * 7 % 13} at some length." for i in range(40)]
+SCRIPT = " ".join(SENTENCES)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(tts_synthesis, "RETRY_DELAY_SECONDS", 0.01)
+
+
+def synthesize(synthesizer, output_path, **kwargs):
+    return asyncio.run(synthesize_long_text(
+        SCRIPT, "en-US-Test", str(output_path), synthesizer=synthesizer, max_chars=300, **kwargs,
+    ))
+
+
+def test_chunks_are_written_in_script_order(tmp_path):
+    chunks = split_script(SCRIPT, 300)
+    # The first chunk fails once, so it finishes last and must still be written first
+    synthesizer = FakeSynthesizer(failures={chunks[0]: 1})
+    output = tmp_path / "out.mp3"
+
+    assert synthesize(synthesizer, output, concurrency=4) == len(chunks)
+    assert output.read_bytes() == b"".join(f"[en-US-Test] {chunk}\n".encode() for chunk in chunks)
+
+
+def test_concurrency_limit_is_respected(tmp_path):
+    synthesizer = FakeSynthesizer(delay=0.02)
+    synthesize(synthesizer, tmp_path / "out.mp3", concurrency=3)
+    assert synthesizer.max_active == 3
+
+
+def test_failed_chunk_is_retried_alone(tmp_path):
+    chunks = split_script(SCRIPT, 300)
+    synthesizer = FakeSynthesizer(failures={chunks[2]: 2})
+    synthesize(synthesizer, tmp_path / "out.mp3", retries=3)
+
+    calls = [text for text, _, _ in synthesizer.calls]
+    assert calls.count(chunks[2]) == 3
+    assert all(calls.count(chunk) == 1 for i, chunk in enumerate(chunks) if i != 2)
+
+
+def test_chunk_failing_every_attempt_fails_the_job(tmp_path):
+    chunks = split_script(SCRIPT, 300)
+    synthesizer = FakeSynthesizer(failures={chunks[1]: 10})
+    with pytest.raises(RuntimeError, match=f"Chunk 2/{len(chunks)} failed after 3 attempts"):
+        synthesize(synthesizer, tmp_path / "out.mp3", retries=2)
+
+
+def test_progress_is_reported_per_chunk(tmp_path):
+    progress = []
+    total = synthesize(FakeSynthesizer(), tmp_path / "out.mp3", on_progress=lambda done, of: progress.append((done, of)))
+    assert progress == [(done, total) for done in range(1, total + 1)]
+
+
+def test_split_script_respects_size_and_paragraphs():
+    script = SCRIPT + "\n\n" + "A second paragraph starts here."
+    chunks = split_script(script, 300)
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert chunks[-1] == "A second paragraph starts here."
+    assert " ".join(chunks[:-1]) == SCRIPT
+
+
+def test_split_script_break_points_survive_an_edit():
+    before = split_script(SCRIPT, 300)
+    edited = list(SENTENCES)
+    edited[20] = "This sentence was rewritten by the editor."
+    after = split_script(" ".join(edited), 300)
+
+    # Only the chunk holding the edit, and at most the one after it, change; the rest keep their cached audio
+    changed = [chunk for chunk in after if chunk not in before]
+    assert 1 <= len(changed) <= 2
+    assert all("rewritten" in chunk or after.index(chunk) == after.index(changed[0]) + 1 for chunk in changed)
+    edited_index = next(i for i, chunk in enumerate(after) if "rewritten" in chunk)
+    assert after[:edited_index] == before[:edited_index]
+
+
+def test_cached_synthesizer_serves_repeats_from_disk(cache_root):
+    fake = FakeSynthesizer()
+    cached = CachedSynthesizer(fake)
+    first, second = [], []
+
+    audio = asyncio.run(cached.synthesize("Hello there.", "en-US-Test", boundaries=first))
+    assert asyncio.run(cached.synthesize("Hello there.", "en-US-Test", boundaries=second)) == audio
+    assert (len(fake.calls), cached.hits, cached.misses) == (1, 1, 1)
+    assert second == first
+
+
+def test_cached_synthesizer_keys_on_voice_and_options(cache_root):
+    fake = FakeSynthesizer()
+    cached = CachedSynthesizer(fake)
+    asyncio.run(cached.synthesize("Hello there.", "en-US-Test"))
+    asyncio.run(cached.synthesize("Hello there.", "en-GB-Test"))
+    asyncio.run(cached.synthesize("Hello there.", "en-US-Test", rate="+10%"))
+    assert (len(fake.calls), cached.hits, cached.misses) == (3, 0, 3)
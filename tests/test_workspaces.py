@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import workspaces
+from workspaces import Workspace, raise_static_limit
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspaces, "WORKSPACE_ROOT", str(tmp_path / "workspaces"))
+    monkeypatch.setattr(workspaces, "PUBLIC_ROOT", str(tmp_path / "static"))
+    workspace = Workspace("ab" * 16)
+    os.makedirs(workspace.path)
+    return workspace
+
+
+def sparse_file(path, size):
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def test_files_over_streamlits_cap_are_published(workspace, monkeypatch):
+    from streamlit.web.server import app_static_file_handler
+
+    monkeypatch.setattr(app_static_file_handler, "MAX_APP_STATIC_FILE_SIZE", 200 * (1 << 20))
+    sparse_file(workspace.file("big.mp4"), 300 * (1 << 20))
+
+    assert workspace.publish("big.mp4") == f"app/static/jobs/{workspace.id}/big.mp4"
+    assert app_static_file_handler.MAX_APP_STATIC_FILE_SIZE == workspaces.STATIC_SERVING_MAX_BYTES
+    assert os.path.samefile(workspace.file("big.mp4"), os.path.join(workspaces.PUBLIC_ROOT, workspace.id, "big.mp4"))
+
+
+def test_files_over_the_static_limit_are_not_published(workspace, monkeypatch):
+    monkeypatch.setattr(workspaces, "raise_static_limit", lambda: 1000)
+    sparse_file(workspace.file("big.mp4"), 1001)
+    assert workspace.publish("big.mp4") is None
+
+
+def test_static_limit_is_never_lowered(monkeypatch):
+    from streamlit.web.server import app_static_file_handler
+
+    monkeypatch.setattr(app_static_file_handler, "MAX_APP_STATIC_FILE_SIZE", workspaces.STATIC_SERVING_MAX_BYTES * 2)
+    assert raise_static_limit() == workspaces.STATIC_SERVING_MAX_BYTES * 2
+
+
+def download_script():
+    from workspaces import Workspace, offer_download, preview_video
+
+    workspace = Workspace("ab" * 16)
+    preview_video(workspace, "out.mp4")
+    offer_download(workspace, "out.mp4", "Download Video", "out.mp4", "video/mp4")
+
+
+@pytest.mark.parametrize("size, loaded", [(1000, True), (5000, False)])
+def test_unpublished_files_are_only_loaded_when_small(workspace, monkeypatch, size, loaded):
+    monkeypatch.setattr(Workspace, "publish", lambda self, name: None)  # Static serving off or over its limit
+    monkeypatch.setattr(workspaces, "IN_MEMORY_MAX_BYTES", 4096)
+    sparse_file(workspace.file("out.mp4"), size)
+
+    app = AppTest.from_function(download_script).run()
+    assert not app.exception
+    assert bool(app.get("download_button")) == loaded
+    assert bool(app.get("video")) == loaded
+    if not loaded:
+        assert workspace.file("out.mp4") in app.warning[0].value
@@ -0,0 +1,81 @@
+"""The studio's tools, imported only when first selected.
+
+app.py is re-executed on every interaction, but this module (and every tool
+it has loaded) stays in sys.modules, so a tool's dependencies are imported
+once per server process and only if someone opens it. Import costs are
+recorded as tools load; for cold numbers per tool run:
+
+    python tool_registry.py
+"""
+import importlib
+import json
+import logging
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# In card order: module and function of each tool, plus its card
+TOOLS = {
+    "Text-to-Speech": {
+        "module": "tts_tool", "function": "tts_tool",
+        "icon": "📝", "description": "Convert text to speech.",
+    },
+    "MP3 to MP4": {
+        "module": "mp3_to_mp4_tool", "function": "mp3_to_mp4_tool",
+        "icon": "🎧", "description": "Convert MP3 files to MP4 videos.",
+    },
+    "MP3 Word Timestamps": {
+        "module": "mp3_word_timestamp_tool", "function": "mp3_word_timestamp_tool",
+        "icon": "🎤", "description": "Generate word-level speech timestamps.",
+    },
+    "MP4 Subtitle Animation": {
+        "module": "mp4_subtitle_animation_tool", "function": "mp4_subtitle_animation_tool",
+        "icon": "🎮", "description": "Create animated subtitles for videos.",
+    },
+    "Template Designer": {
+        "module": "template_designer_tool", "function": "template_designer_tool",
+        "icon": "🎨", "description": "Create and apply subtitle styles.",
+    },
+}
+
+IMPORT_COSTS = {}  # Tool name -> {"seconds", "modules"} measured when it was first loaded in this process
+
+
+def load_tool(name):
+    """Returns a tool's function, importing its module on first use."""
+    tool = TOOLS[name]
+    if name not in IMPORT_COSTS:
+        before = len(sys.modules)
+        started = time.perf_counter()
+        importlib.import_module(tool["module"])
+        IMPORT_COSTS[name] = {
+            "seconds": round(time.perf_counter() - started, 3),
+            "modules": len(sys.modules) - before,
+        }
+        logger.info("Loaded %s in %.3fs (%d modules)", name, IMPORT_COSTS[name]["seconds"], IMPORT_COSTS[name]["modules"])
+    return getattr(sys.modules[tool["module"]], tool["function"])
+
+
+def measure_cold_import(module):
+    """Imports a module in a fresh interpreter (with Streamlit already loaded, as in the app)."""
+    code = (
+        "import json, sys, time; import streamlit; before = len(sys.modules); started = time.perf_counter(); "
+        f"import {module}; "
+        "print(json.dumps({'seconds': time.perf_counter() - started, 'modules': len(sys.modules) - before}))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'Tool':28s} {'import s':>9} {'modules':>8}")
+    for name, tool in TOOLS.items():
+        cost = measure_cold_import(tool["module"])
+        print(f"{name:28s} {cost['seconds']:>9.3f} {cost['modules']:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
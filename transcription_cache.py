@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+
+from disk_cache import DiskCache
+
+CHUNK_SIZE = 1 << 20  # 1 MiB per read while hashing and streaming uploads
+MAX_CACHE_BYTES = int(os.environ.get("AVS_TRANSCRIPTION_CACHE_MB", "512")) * (1 << 20)
+
+_cache = None
+
+
+def get_transcription_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache("transcriptions", MAX_CACHE_BYTES)
+    return _cache
+
+
+def save_upload_hashed(uploaded_file, dest_path, chunk_size=CHUNK_SIZE):
+    """Streams an upload to disk in chunks, hashing it on the way; returns the SHA-256 hex digest."""
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as f:
+        while True:
+            chunk = uploaded_file.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """Returns the SHA-256 hex digest of a file, read incrementally."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def transcription_key(audio_hash, engine, model_name, options):
+    """Cache key for one audio file under one engine, model and set of options."""
+    settings = json.dumps({"engine": engine, "model": model_name, "options": options}, sort_keys=True)
+    return f"{audio_hash}-{hashlib.sha256(settings.encode()).hexdigest()[:16]}.json"
+
+
+def cached_transcription(audio_hash, engine, model_name, options, transcribe):
+    """Returns the stored result for this audio and settings, or runs transcribe() and stores it."""
+    cache = get_transcription_cache()
+    key = transcription_key(audio_hash, engine, model_name, options)
+
+    data = cache.get_bytes(key)
+    if data is not None:
+        return json.loads(data)
+
+    result = transcribe()
+    cache.put_bytes(key, json.dumps(result, ensure_ascii=False).encode("utf-8"))
+    return result
@@ -0,0 +1,157 @@
+import copy
+import json
+import os
+import threading
+
+import ffmpeg
+
+from ffmpeg_io import check_decoder, collect_stderr
+
+DEFAULT_MODEL = "small"
+VOSK_SAMPLE_RATE = 16000
+VOSK_CHUNK_BYTES = 1 << 18  # 256 KiB, about 8 s of 16 kHz mono 16-bit PCM
+
+
+class WhisperBackend:
+    """Runs openai-whisper in-process with word timestamps."""
+
+    def __init__(self, model_name=DEFAULT_MODEL):
+        import whisper  # Heavy (torch); only imported when the backend is first used
+
+        self.model_name = model_name
+        self.model = whisper.load_model(model_name)
+
+    def transcribe(self, audio_path, **options):
+        return self.model.transcribe(audio_path, word_timestamps=True, **options)
+
+
+class StubBackend:
+    """Model-free backend for tests: returns a canned result or evenly spaced words."""
+
+    def __init__(self, model_name="stub", result=None, text="this is a stub transcript", word_seconds=0.5):
+        self.model_name = model_name
+        self.result = result
+        self.text = text
+        self.word_seconds = word_seconds
+        self.calls = []
+
+    def transcribe(self, audio_path, **options):
+        self.calls.append((audio_path, options))
+        if self.result is not None:
+            return copy.deepcopy(self.result)
+
+        words = [
+            {"word": f" {word}", "start": i * self.word_seconds, "end": (i + 1) * self.word_seconds, "probability": 1.0}
+            for i, word in enumerate(self.text.split())
+        ]
+        segment = {"id": 0, "seek": 0, "start": 0.0, "end": words[-1]["end"] if words else 0.0,
+                   "text": " " + self.text, "words": words}
+        return {"text": " " + self.text, "segments": [segment], "language": "en"}
+
+
+BACKENDS = {"whisper": WhisperBackend, "stub": StubBackend}
+
+
+def register_backend(name, factory):
+    """Makes a backend available by name; factory(model_name, **options) must return an object with transcribe()."""
+    BACKENDS[name] = factory
+
+
+class TranscriptionService:
+    """Holds one loaded model for the life of the process.
+
+    The model is loaded on first use, and calls are serialized because a
+    single model instance is not safe to run from several threads at once.
+    """
+
+    def __init__(self, backend="whisper", model_name=DEFAULT_MODEL, **backend_options):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown transcription backend {backend!r}, expected one of {sorted(BACKENDS)}")
+        self.backend_name = backend
+        self.model_name = model_name
+        self.backend_options = backend_options
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._backend is None:
+            self._backend = BACKENDS[self.backend_name](model_name=self.model_name, **self.backend_options)
+        return self._backend
+
+    def transcribe(self, audio_path, **options):
+        """Transcribes an audio file and returns the result dict (text, segments with words, language)."""
+        with self._lock:
+            return self._load().transcribe(audio_path, **options)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_transcription_service(backend=None, model_name=DEFAULT_MODEL):
+    """Returns the process-wide service for a backend and model.
+
+    Module state survives Streamlit reruns and is shared by every session, so
+    each model is loaded once per server process. The backend defaults to
+    AVS_TRANSCRIBE_BACKEND, or whisper.
+    """
+    backend = backend or os.environ.get("AVS_TRANSCRIBE_BACKEND", "whisper")
+    with _services_lock:
+        key = (backend, model_name)
+        if key not in _services:
+            _services[key] = TranscriptionService(backend, model_name)
+        return _services[key]
+
+
+_vosk_models = {}
+_vosk_lock = threading.Lock()
+
+
+def get_vosk_model(model_path):
+    """Loads a Vosk model once per process; recognizers for any number of streams can share it."""
+    with _vosk_lock:
+        if model_path not in _vosk_models:
+            from vosk import Model  # Only imported when Vosk is actually used
+
+            _vosk_models[model_path] = Model(model_path)
+        return _vosk_models[model_path]
+
+
+def iter_vosk_words(audio_path, model_path, chunk_bytes=VOSK_CHUNK_BYTES):
+    """Yields Vosk word dicts (word, start, end, conf) while the audio is still decoding.
+
+    ffmpeg decodes any input straight to 16 kHz mono PCM on a pipe, so memory
+    stays constant regardless of length and no temporary WAV is written.
+    """
+    from vosk import KaldiRecognizer
+
+    recognizer = KaldiRecognizer(get_vosk_model(model_path), VOSK_SAMPLE_RATE)
+    recognizer.SetWords(True)  # Enable word-level timings
+
+    process = (
+        ffmpeg.input(audio_path)
+        .audio.output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=VOSK_SAMPLE_RATE)
+        .global_args("-loglevel", "error")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+    reader, errors = collect_stderr(process)
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            if recognizer.AcceptWaveform(data):
+                yield from json.loads(recognizer.Result()).get("result", [])
+
+        # An undecodable upload must fail, not come back (and get cached) as an empty transcript
+        check_decoder(process, reader, errors, audio_path)
+
+        # Words still buffered in the recognizer
+        yield from json.loads(recognizer.FinalResult()).get("result", [])
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        reader.join()
+        process.stderr.close()
@@ -0,0 +1,344 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import re
+import zlib
+
+from disk_cache import DiskCache
+
+MAX_CHUNK_CHARS = 1500  # Well under the service's per-request limit, and a few sentences of audio
+MIN_CHUNK_CHARS = 200
+CHUNK_BREAK_MODULUS = 3  # About one sentence in three may end a chunk once it has MIN_CHUNK_CHARS
+MAX_AUDIO_CACHE_BYTES = int(os.environ.get("AVS_TTS_CACHE_MB", "256")) * (1 << 20)
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 3
+RETRY_DELAY_SECONDS = 0.5  # Doubled after every failed attempt
+
+TICKS_PER_SECOND = 10_000_000  # edge-tts offsets and durations are in 100 ns ticks
+SEGMENT_MAX_WORDS = 30
+RESYNC_MAX_WORDS = 4  # Script words a boundary match may skip, e.g. "5" or "$5.00" spoken as "five dollars"
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+")
+WORD_SENTENCE_END = re.compile(r"[.!?…][\"')\]”’]*$")
+LINE_END = re.compile(r"[ \t]*\r?\n")
+
+
+def word_boundary_options(communicate_class):
+    """Communicate kwargs that make edge-tts emit WordBoundary events.
+
+    edge-tts 7.0.0 (pinned) always sends them; later releases default to
+    SentenceBoundary and take a boundary argument instead.
+    """
+    if "boundary" in inspect.signature(communicate_class).parameters:
+        return {"boundary": "WordBoundary"}
+    return {}
+
+
+def find_word(text, word, start):
+    """Finds word in text from start, only where it begins a word (not "a" inside "fact"); -1 if absent."""
+    position = text.find(word, start)
+    while position > 0 and text[position - 1].isalnum():
+        position = text.find(word, position + 1)
+    return position
+
+
+def boundaries_to_transcript(boundaries, text, language="en"):
+    """Builds an audio.json-style transcript (segments with words) from WordBoundary events.
+
+    Each word is matched back to the script to recover its trailing
+    punctuation, and segments end at sentence ends and line breaks. Words
+    spoken differently from how they are written ("5" read as "five") keep
+    the spoken text, and matching picks up again at the next word found
+    within RESYNC_MAX_WORDS script words.
+    """
+    segments, words, segment_done = [], [], False
+    cursor = matched = 0  # End of the last word taken from the script, and of its last boundary inside it
+
+    def close_segment():
+        if words:
+            segments.append({
+                "id": len(segments),
+                "seek": 0,
+                "start": words[0]["start"],
+                "end": words[-1]["end"],
+                "text": "".join(word["word"] for word in words),
+                "words": list(words),
+            })
+            words.clear()
+
+    for boundary in boundaries:
+        word_text = boundary["text"]
+        offset = boundary["offset"] / TICKS_PER_SECOND
+        end_time = round(offset + boundary["duration"] / TICKS_PER_SECOND, 3)
+        position = find_word(text, word_text, matched)
+        if position != -1 and position < cursor and words:
+            # Another part of the word just written (e.g. "well-known"): extend it
+            words[-1]["end"] = end_time
+            matched = position + len(word_text)
+            continue
+
+        # Close the previous segment only now, once no more parts of its last word can follow
+        if segment_done:
+            close_segment()
+        segment_done = False
+        if position >= cursor:
+            # Widen the match to the surrounding quotes and punctuation
+            start, end = position, position + len(word_text)
+            while start > cursor and not text[start - 1].isspace():
+                start -= 1
+            while end < len(text) and not text[end].isspace():
+                end += 1
+            # Only take the match if it is the next word (or close after words that were spoken differently),
+            # not the same word much further along
+            skipped = text[cursor:start].split()
+            if len(skipped) <= RESYNC_MAX_WORDS:
+                # A sentence or line that ended among the skipped words still ends its segment
+                if skipped and (WORD_SENTENCE_END.search(skipped[-1]) or "\n" in text[cursor:start]):
+                    close_segment()
+                word_text = text[start:end]
+                segment_done = bool(WORD_SENTENCE_END.search(word_text)) or bool(LINE_END.match(text, end))
+                cursor, matched = end, position + len(boundary["text"])
+
+        words.append({
+            "word": " " + word_text,
+            "start": round(offset, 3),
+            "end": end_time,
+            "probability": 1.0,
+        })
+        segment_done = segment_done or len(words) >= SEGMENT_MAX_WORDS
+    close_segment()
+
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments, "language": language}
+
+
+def write_transcript(transcript, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(transcript, f, indent=4, ensure_ascii=False)
+
+
+class EdgeSynthesizer:
+    """Synthesizes MP3 audio with the edge-tts service."""
+
+    def __init__(self):
+        import edge_tts  # Only imported when the live service is used
+
+        self.edge_tts = edge_tts
+
+    async def synthesize(self, text, voice, boundaries=None, **options):
+        """Returns the MP3 bytes; WordBoundary events are appended to boundaries when given."""
+        communicate = self.edge_tts.Communicate(text, voice, **word_boundary_options(self.edge_tts.Communicate), **options)
+        audio = bytearray()
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio += chunk["data"]
+            elif chunk["type"] == "WordBoundary" and boundaries is not None:
+                boundaries.append(chunk)
+        return bytes(audio)
+
+
+class FakeSynthesizer:
+    """Local stand-in for tests: returns the text as bytes after a delay.
+
+    failures maps a text to how many times it should fail before succeeding,
+    so retries can be exercised without the network.
+    """
+
+    def __init__(self, delay=0.01, failures=None):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def synthesize(self, text, voice, boundaries=None, **options):
+        self.calls.append((text, voice, options))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures.get(text, 0) > 0:
+                self.failures[text] -= 1
+                raise ConnectionError(f"Fake failure for {text[:20]!r}")
+            if boundaries is not None:
+                # One word every 0.3 s
+                boundaries.extend(
+                    {"type": "WordBoundary", "offset": i * 3_000_000, "duration": 2_500_000, "text": word.strip(".,!?")}
+                    for i, word in enumerate(text.split())
+                )
+            return f"[{voice}] {text}\n".encode("utf-8")
+        finally:
+            self.active -= 1
+
+
+SYNTHESIZERS = {"edge": EdgeSynthesizer, "fake": FakeSynthesizer}
+
+_audio_cache = None
+
+
+def get_audio_cache():
+    global _audio_cache
+    if _audio_cache is None:
+        _audio_cache = DiskCache("tts_audio", MAX_AUDIO_CACHE_BYTES)
+    return _audio_cache
+
+
+def audio_cache_key(text, voice, options):
+    """Cache key for one text spoken by one voice with one set of rate/pitch/volume options."""
+    settings = json.dumps({"text": text, "voice": voice, "options": options}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+
+class CachedSynthesizer:
+    """Serves repeated (text, voice, options) requests from the on-disk audio cache.
+
+    The MP3 and its word boundaries are stored as two entries of one
+    DiskCache, so hits never reach the wrapped synthesizer.
+    """
+
+    def __init__(self, synthesizer, cache=None):
+        self.synthesizer = synthesizer
+        self.cache = cache or get_audio_cache()
+        self.hits = 0
+        self.misses = 0
+
+    async def synthesize(self, text, voice, boundaries=None, **options):
+        key = audio_cache_key(text, voice, options)
+        audio = self.cache.get_bytes(f"{key}.mp3")
+        if audio is not None:
+            words = self.cache.get_bytes(f"{key}.words.json") if boundaries is not None else b"[]"
+            if words is not None:
+                self.hits += 1
+                if boundaries is not None:
+                    boundaries.extend(json.loads(words))
+                return audio
+
+        self.misses += 1
+        collected = []
+        audio = await self.synthesizer.synthesize(text, voice, boundaries=collected, **options)
+        self.cache.put_bytes(f"{key}.words.json", json.dumps(collected).encode("utf-8"))
+        self.cache.put_bytes(f"{key}.mp3", audio)
+        if boundaries is not None:
+            boundaries.extend(collected)
+        return audio
+
+
+def get_synthesizer(name=None, cached=True):
+    """Creates the synthesizer named by name, AVS_TTS_BACKEND, or edge, behind the audio cache."""
+    name = name or os.environ.get("AVS_TTS_BACKEND", "edge")
+    if name not in SYNTHESIZERS:
+        raise ValueError(f"Unknown TTS backend {name!r}, expected one of {sorted(SYNTHESIZERS)}")
+    synthesizer = SYNTHESIZERS[name]()
+    return CachedSynthesizer(synthesizer) if cached else synthesizer
+
+
+async def generate_audio(text, voice, output_file, words_file=None):
+    """Speaks text to output_file in one request, through the audio cache.
+
+    With words_file, the WordBoundary events are saved as audio.json-style
+    word timestamps.
+    """
+    boundaries = []
+    audio = await get_synthesizer().synthesize(text, voice, boundaries=boundaries)
+    with open(output_file, "wb") as f:
+        f.write(audio)
+
+    if words_file:
+        write_transcript(boundaries_to_transcript(boundaries, text, language=voice.split("-")[0]), words_file)
+
+
+def split_long_piece(piece, max_chars):
+    """Splits an over-long sentence on commas, then on spaces."""
+    parts, current = [], ""
+    for word in re.split(r"(?<=[,;:])\s+|\s+", piece):
+        if current and len(current) + 1 + len(word) > max_chars:
+            parts.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_script(text, max_chars=MAX_CHUNK_CHARS, min_chars=MIN_CHUNK_CHARS):
+    """Splits a script into chunks of whole sentences, never across paragraphs.
+
+    Besides the size limit, a chunk may end after any sentence whose checksum
+    is divisible by CHUNK_BREAK_MODULUS. Those break points depend only on
+    the sentence itself, so editing one sentence leaves the chunks around it
+    unchanged and their cached audio is reused.
+    """
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        current = ""
+        for sentence in SENTENCE_END.split(paragraph):
+            for piece in split_long_piece(sentence, max_chars) if len(sentence) > max_chars else [sentence]:
+                if current and len(current) + 1 + len(piece) > max_chars:
+                    chunks.append(current)
+                    current = piece
+                else:
+                    current = f"{current} {piece}" if current else piece
+                if len(current) >= min_chars and zlib.crc32(piece.encode("utf-8")) % CHUNK_BREAK_MODULUS == 0:
+                    chunks.append(current)
+                    current = ""
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+async def synthesize_chunk(synthesizer, text, voice, semaphore, retries, options):
+    """Synthesizes one chunk, retrying it alone with exponential backoff."""
+    async with semaphore:
+        for attempt in range(retries + 1):
+            try:
+                return await synthesizer.synthesize(text, voice, **options)
+            except Exception:
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(RETRY_DELAY_SECONDS * 2 ** attempt)
+
+
+async def synthesize_long_text(text, voice, output_path, synthesizer=None, concurrency=DEFAULT_CONCURRENCY,
+                               retries=DEFAULT_RETRIES, max_chars=MAX_CHUNK_CHARS, on_progress=None, **options):
+    """Synthesizes a long script chunk by chunk, with at most concurrency requests in flight.
+
+    Chunks are appended to output_path in script order as soon as every chunk
+    before them is done, so the file always holds a playable prefix. MP3
+    frames are joined byte for byte, the way edge-tts joins its own requests,
+    so no silence is added and nothing is re-encoded. on_progress(done, total)
+    is called as chunks complete. Returns the number of chunks.
+    """
+    synthesizer = synthesizer or get_synthesizer()
+    chunks = split_script(text, max_chars)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index):
+        try:
+            return index, await synthesize_chunk(synthesizer, chunks[index], voice, semaphore, retries, options)
+        except Exception as error:
+            raise RuntimeError(f"Chunk {index + 1}/{len(chunks)} failed after {retries + 1} attempts: {error}") from error
+
+    tasks = [asyncio.ensure_future(run(i)) for i in range(len(chunks))]
+    finished, next_index = {}, 0
+    try:
+        with open(output_path, "wb") as f:
+            for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+                index, audio = await task
+                finished[index] = audio
+                while next_index in finished:
+                    f.write(finished.pop(next_index))
+                    next_index += 1
+                f.flush()
+                if on_progress:
+                    on_progress(done, len(chunks))
+    finally:
+        # On failure, stop the chunks still waiting and collect their outcomes
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return len(chunks)
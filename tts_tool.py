@@ -1,40 +1,14 @@
 import streamlit as st
 import asyncio
-from edge_tts import VoicesManager, Communicate
 import os
+from voice_catalogue import get_voice_catalogue
+from workspaces import create_workspace, open_workspace, offer_download
+from job_queue import submit_job, remember_job, job_panel, session_owner
+from tts_synthesis import get_synthesizer, DEFAULT_CONCURRENCY
 
-async def list_voices(gender=None, language=None):
-    # Create a VoicesManager instance
-    voices_manager = await VoicesManager.create()
-    voices = voices_manager.voices
-
-    # Filter voices based on gender and language
-    filtered_voices = []
-    for voice in voices:
-        voice_gender = voice["Gender"].lower()
-        voice_locale = voice["Locale"].lower()
-
-        # Gender filter
-        gender_match = (
-            (gender.lower() == voice_gender) or
-            (gender == "any")
-        )
-
-        # Language filter
-        language_match = (
-            (language.lower() in voice_locale) or
-            (language == "any")
-        )
-
-        if gender_match and language_match:
-            filtered_voices.append(voice)
-
-    return filtered_voices
-
-async def generate_audio(text, voice, output_file):
-    # Use edge_tts to generate audio
-    communicate = Communicate(text, voice)
-    await communicate.save(output_file)
+def list_voices(gender=None, language=None):
+    # Look up the cached voice catalogue, pre-indexed by gender and language ("Any" matches all)
+    return get_voice_catalogue().filter(gender, language)
 
 def tts_tool():
     st.write("Convert text to speech and generate audio files.")
@@ -49,7 +23,7 @@ def tts_tool():
     language = st.selectbox("Select Language:", ["en", "es", "fr", "de", "it", "Any"])  # Use language codes
 
     # Get filtered voices
-    filtered_voices = asyncio.run(list_voices(gender, language))
+    filtered_voices = list_voices(gender, language)
 
     # Display filtered voice models
     st.subheader("Available Voice Models")
@@ -62,36 +36,55 @@ def tts_tool():
 
     # Preview selected voice
     if st.button("Preview Voice"):
-        # Use edge_tts to preview the voice
+        # Previews are short and cached, so they are played straight from memory
         preview_text = "This is a preview of the selected voice model."
-        asyncio.run(generate_audio(preview_text, selected_voice, "preview_audio.mp3"))
-        st.audio("preview_audio.mp3", format="audio/mp3")
+        st.audio(asyncio.run(get_synthesizer().synthesize(preview_text, selected_voice)), format="audio/mp3")
         st.write("Previewing voice model...")
 
+    # Long scripts are split on sentences and synthesized concurrently
+    long_text = st.checkbox("Long-text mode (synthesize chunks concurrently)")
+    concurrency = st.slider("Concurrent requests", 1, 8, DEFAULT_CONCURRENCY, disabled=not long_text)
+    save_words = st.checkbox("📝 Save word timestamps (audio.json for subtitle animation, no transcription needed)",
+                             value=True, disabled=long_text)
+
     # Buttons
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Generate Audio"):
             if text_input or uploaded_file:
                 text_to_speak = text_input if text_input else uploaded_file.getvalue().decode("utf-8")
-                asyncio.run(generate_audio(text_to_speak, selected_voice, "generated_audio.mp3"))
-                st.success("Audio file generated successfully!")
+                # Each job gets its own workspace, so concurrent users never share files
+                workspace = create_workspace()
+                job_id = submit_job("tts", {
+                    "workspace": workspace.id,
+                    "text": text_to_speak,
+                    "voice": selected_voice,
+                    "output_path": workspace.file("generated_audio.mp3"),
+                    "words_path": workspace.file("generated_audio.json") if save_words and not long_text else None,
+                    "long_text": long_text,
+                    "concurrency": concurrency,
+                }, owner=session_owner())
+                remember_job("tts_job", job_id)
             else:
                 st.error("Please enter text or upload a file.")
+
+    # The session's latest audio, once its job is done
+    job = job_panel("tts_job", "tts")
+    workspace = open_workspace(job["params"]["workspace"]) if job else None
     with col2:
         if st.button("Test Generated Audio"):
-            if os.path.exists("generated_audio.mp3"):
-                st.audio("generated_audio.mp3", format="audio/mp3")
+            if workspace:
+                st.audio(workspace.file("generated_audio.mp3"), format="audio/mp3")
             else:
                 st.error("No audio file found. Please generate the audio first.")
 
-    # Download generated audio
-    if os.path.exists("generated_audio.mp3"):
-        with open("generated_audio.mp3", "rb") as f:
-            audio_bytes = f.read()
-        st.download_button(
-            label="Download Audio",
-            data=audio_bytes,
-            file_name="generated_audio.mp3",
-            mime="audio/mp3"
-        )
\ No newline at end of file
+    if workspace:
+        st.success("Audio file generated successfully!")
+
+        # Download generated audio
+        offer_download(workspace, "generated_audio.mp3", "Download Audio", "generated_audio.mp3", "audio/mp3")
+
+        # Download word timestamps captured during synthesis
+        if os.path.exists(workspace.file("generated_audio.json")):
+            offer_download(workspace, "generated_audio.json", "Download Word Timestamps (audio.json)", "audio.json",
+                           "application/json")
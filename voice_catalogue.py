@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from disk_cache import cache_dir, write_atomic
+
+logger = logging.getLogger(__name__)
+
+# How long a fetched catalogue is fresh; override with AVS_VOICE_CATALOGUE_TTL (seconds)
+CATALOGUE_TTL_SECONDS = int(os.environ.get("AVS_VOICE_CATALOGUE_TTL", str(24 * 60 * 60)))
+CATALOGUE_FILE = "edge_voices.json"
+
+
+class VoiceCatalogue:
+    """The edge-tts voice list, indexed by gender and locale prefix.
+
+    Every (gender, prefix) pair is indexed up front, including "any" for
+    either, so a filter is a single dict lookup. A prefix is a language
+    ("en") or a full locale ("en-us"), lower-cased.
+    """
+
+    def __init__(self, voices, fetched=0.0):
+        self.voices = voices
+        self.fetched = fetched
+        self._index = {}
+        for voice in voices:
+            gender = voice.get("Gender", "").lower()
+            locale = voice.get("Locale", "").lower()
+            for gender_key in (gender, "any"):
+                for prefix in (locale.split("-")[0], locale, "any"):
+                    self._index.setdefault((gender_key, prefix), []).append(voice)
+
+    def filter(self, gender=None, language=None):
+        """Voices matching a gender and language/locale; None or "Any" matches everything."""
+        return self._index.get(((gender or "any").lower(), (language or "any").lower()), [])
+
+    def is_stale(self, ttl=CATALOGUE_TTL_SECONDS):
+        return time.time() - self.fetched > ttl
+
+
+def catalogue_path():
+    return os.path.join(cache_dir("voices"), CATALOGUE_FILE)
+
+
+def fetch_catalogue():
+    """Downloads the voice list from the edge-tts service and stores it on disk."""
+    from edge_tts import list_voices  # Only imported when the service is queried
+
+    voices = asyncio.run(list_voices())
+    fetched = time.time()
+    write_atomic(catalogue_path(), json.dumps({"fetched": fetched, "voices": voices}).encode("utf-8"))
+    return VoiceCatalogue(voices, fetched)
+
+
+def load_catalogue():
+    """Reads the stored catalogue, fresh or not, or None if there is none."""
+    try:
+        with open(catalogue_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return VoiceCatalogue(data["voices"], data["fetched"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+_catalogue = None
+_lock = threading.Lock()
+_refresh_thread = None
+
+
+def _refresh():
+    global _catalogue
+    try:
+        catalogue = fetch_catalogue()
+    except Exception:
+        logger.warning("Voice catalogue refresh failed; keeping the cached list", exc_info=True)
+        return
+    with _lock:
+        _catalogue = catalogue
+
+
+def get_voice_catalogue(ttl=CATALOGUE_TTL_SECONDS):
+    """Returns the process-wide voice catalogue.
+
+    Only the first run without a stored catalogue waits for the service.
+    After that a stale catalogue is returned immediately while one
+    background thread fetches a fresh copy for later calls.
+    """
+    global _catalogue, _refresh_thread
+    with _lock:
+        if _catalogue is None:
+            _catalogue = load_catalogue()
+        catalogue = _catalogue
+        if catalogue is not None and catalogue.is_stale(ttl) and not (_refresh_thread and _refresh_thread.is_alive()):
+            _refresh_thread = threading.Thread(target=_refresh, name="voice-catalogue-refresh", daemon=True)
+            _refresh_thread.start()
+
+    if catalogue is None:
+        catalogue = fetch_catalogue()
+        with _lock:
+            _catalogue = catalogue
+    return catalogue
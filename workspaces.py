@@ -0,0 +1,172 @@
+import html
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from disk_cache import CACHE_ROOT
+
+# Private per-job directories for uploads, intermediates and results
+WORKSPACE_ROOT = os.environ.get("AVS_WORKSPACE_DIR", os.path.join(CACHE_ROOT, "workspaces"))
+# Results published for download; Streamlit serves <app dir>/static at app/static/ when
+# server.enableStaticServing is on (see .streamlit/config.toml)
+PUBLIC_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "jobs")
+PUBLIC_URL = "app/static/jobs"
+STREAMLIT_STATIC_MAX_BYTES = 200 * (1 << 20)  # Streamlit's own cap on a static file; it streams them from disk
+STATIC_SERVING_MAX_BYTES = int(os.environ.get("AVS_STATIC_MAX_MB", str(16 * 1024))) * (1 << 20)
+IN_MEMORY_MAX_BYTES = 50 * (1 << 20)  # Largest file handed to st.download_button / st.video, which read it whole
+
+WORKSPACE_TTL_SECONDS = int(os.environ.get("AVS_WORKSPACE_TTL", str(6 * 60 * 60)))
+CLEANUP_INTERVAL_SECONDS = 10 * 60
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB per write while streaming uploads to disk
+
+
+class Workspace:
+    """One job's directory; every file the job reads or writes lives inside it."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.path = os.path.join(WORKSPACE_ROOT, job_id)
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def save_upload(self, uploaded_file, name, chunk_size=UPLOAD_CHUNK_SIZE):
+        """Streams an uploaded file to the workspace in chunks; returns its path."""
+        path = self.file(name)
+        uploaded_file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, chunk_size)
+        return path
+
+    def touch(self):
+        """Marks the workspace as in use, restarting its TTL."""
+        os.utime(self.path)
+
+    def publish(self, name):
+        """Exposes a result for download without copying it; returns its URL or None.
+
+        The file is hard-linked into the static folder, so Streamlit's static
+        handler streams it from disk. Files over the static size limit are not
+        published.
+        """
+        path = self.file(name)
+        if os.path.getsize(path) > raise_static_limit():
+            return None
+        public_dir = os.path.join(PUBLIC_ROOT, self.id)
+        os.makedirs(public_dir, exist_ok=True)
+        public_path = os.path.join(public_dir, name)
+        if os.path.exists(public_path):
+            if os.path.samefile(path, public_path):
+                return f"{PUBLIC_URL}/{self.id}/{name}"
+            os.remove(public_path)  # The result was regenerated
+        try:
+            os.link(path, public_path)
+        except OSError:
+            shutil.copyfile(path, public_path)  # Different filesystem: copy on disk, still not through memory
+        return f"{PUBLIC_URL}/{self.id}/{name}"
+
+
+def raise_static_limit():
+    """Lifts Streamlit's static file size cap to STATIC_SERVING_MAX_BYTES; returns the cap in force.
+
+    The handler streams files in chunks, so the cap guards nothing in memory.
+    The server runs in this process, so setting it here applies to the next
+    request.
+    """
+    try:
+        from streamlit.web.server import app_static_file_handler
+    except ImportError:
+        return STREAMLIT_STATIC_MAX_BYTES
+    limit = getattr(app_static_file_handler, "MAX_APP_STATIC_FILE_SIZE", None)
+    if limit is None:
+        return STREAMLIT_STATIC_MAX_BYTES  # Handler moved in another Streamlit version; keep to its documented cap
+    if limit < STATIC_SERVING_MAX_BYTES:
+        app_static_file_handler.MAX_APP_STATIC_FILE_SIZE = limit = STATIC_SERVING_MAX_BYTES
+    return limit
+
+
+def show_unserved(workspace, name):
+    """Tells the user where a result too large to hand over in memory was saved."""
+    import streamlit as st
+
+    size_mb = os.path.getsize(workspace.file(name)) / (1 << 20)
+    st.warning(
+        f"{name} ({size_mb:.0f} MB) is too large to send through the app without static file serving. "
+        f"It was saved on the server at {workspace.file(name)}."
+    )
+
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+
+def cleanup_workspaces(ttl=WORKSPACE_TTL_SECONDS):
+    """Deletes workspaces and published results not used for ttl seconds."""
+    cutoff = time.time() - ttl
+    for root in (WORKSPACE_ROOT, PUBLIC_ROOT):
+        if not os.path.isdir(root):
+            continue
+        for entry in os.scandir(root):
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def create_workspace():
+    """Creates a new, empty workspace; expired ones are cleaned up every few minutes on the way."""
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.time() - _last_cleanup > CLEANUP_INTERVAL_SECONDS:
+            _last_cleanup = time.time()
+            cleanup_workspaces()
+
+    workspace = Workspace(uuid.uuid4().hex)
+    os.makedirs(workspace.path)
+    return workspace
+
+
+def open_workspace(job_id):
+    """Returns the workspace for a job id if it still exists, else None."""
+    if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+        return None
+    workspace = Workspace(job_id)
+    if not os.path.isdir(workspace.path):
+        return None
+    workspace.touch()
+    return workspace
+
+
+def offer_download(workspace, name, label, file_name, mime):
+    """Shows a download for a workspace file, streamed from disk by the static handler.
+
+    Without static serving (or past its limit) small files fall back to
+    st.download_button, which loads them; larger ones are never read into
+    memory, and their path on the server is shown instead.
+    """
+    import streamlit as st
+
+    url = workspace.publish(name) if st.get_option("server.enableStaticServing") else None
+    if url:
+        st.markdown(
+            f'<a href="{html.escape(url)}" download="{html.escape(file_name)}">📥 {html.escape(label)}</a>',
+            unsafe_allow_html=True,
+        )
+    elif os.path.getsize(workspace.file(name)) <= IN_MEMORY_MAX_BYTES:
+        with open(workspace.file(name), "rb") as f:
+            st.download_button(label, f, file_name=file_name, mime=mime)
+    else:
+        show_unserved(workspace, name)
+
+
+def preview_video(workspace, name):
+    """Plays a workspace video, streamed from the static folder when possible; large ones are never loaded."""
+    import streamlit as st
+
+    url = workspace.publish(name) if st.get_option("server.enableStaticServing") else None
+    if url:
+        st.markdown(f'<video src="{html.escape(url)}" controls style="width: 100%"></video>', unsafe_allow_html=True)
+    elif os.path.getsize(workspace.file(name)) <= IN_MEMORY_MAX_BYTES:
+        st.video(workspace.file(name))
+    else:
+        st.info("The preview is skipped for a video this large; use the download below.")